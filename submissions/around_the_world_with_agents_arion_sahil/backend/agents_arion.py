@@ -3,12 +3,13 @@ import os
 from textwrap import dedent
 from dotenv import load_dotenv
 from agno.agent import Agent, RunResponse
-from agno.models.groq import Groq
 # from agno.models.openai import OpenAIChat
 from agno.team.team import Team
-from agno.tools.duckduckgo import DuckDuckGoTools
 from agno.tools.reasoning import ReasoningTools
 from agno.tools.mcp import MCPTools, MultiMCPTools
+from search_cache import CachedDuckDuckGoTools, plan_scope
+from ledger import trip_scope
+from router import model_router, arun_routed
 # from agno.tools.yfinance import YFinanceTools
 
 # from config import CONFIG
@@ -19,34 +20,41 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 
 ## Transport Agent
-transport_agent = Agent(
-    name = "Transport Agent",
-    role = "Fetches transportation information from a given location to another location.",
-    model = Groq(id = "llama-3.3-70b-versatile"),
-    tools = [DuckDuckGoTools(fixed_max_results=2)],
-    instructions = ["Come up with a plan to get from one location to another. Use the tools provided to find the best route.", "Add the sources", "Add the prices", "Add the time taken", "Add the distance", "Add the transportation options", "Add the best route"],
-    markdown = True,
-)
+def build_transport_agent():
+    return Agent(
+        name = "Transport Agent",
+        role = "Fetches transportation information from a given location to another location.",
+        model = model_router.model("arion_member"),
+        tools = [CachedDuckDuckGoTools(fixed_max_results=2)],
+        instructions = ["Come up with a plan to get from one location to another. Use the tools provided to find the best route.", "Add the sources", "Add the prices", "Add the time taken", "Add the distance", "Add the transportation options", "Add the best route"],
+        markdown = True,
+    )
 
 ## Team Leader Agent
-team_leader = Team(
-    name = "Team Leader Agent",
-    mode = "coordinate",
-    model = Groq(id = "llama-3.3-70b-versatile"),
-    members = [transport_agent],
-    tools = [ReasoningTools(add_instructions=True), DuckDuckGoTools()],
-    instructions = [
-        "Use the tools provided to reason about the problem and come up with a plan.",
-        "Coordinate with the other agents to ensure that they are all working towards the same goal.",
-        "Use the tools provided to find the best route.",
-        "Use the tools provided to find the best transportation options.",
-    ],
-    markdown = True,
-    show_members_responses = True,
-    enable_agentic_context = True,
-    success_criteria = "The team has successfully completed the task.",
-)
+def build_team_leader(members: list = None):
+    """
+    A fresh team per call, so several runs can be scheduled side by side without sharing run state
+    """
+    return Team(
+        name = "Team Leader Agent",
+        mode = "coordinate",
+        model = model_router.model("arion_team"),
+        members = members or [build_transport_agent()],
+        tools = [ReasoningTools(add_instructions=True), CachedDuckDuckGoTools()],
+        instructions = [
+            "Use the tools provided to reason about the problem and come up with a plan.",
+            "Coordinate with the other agents to ensure that they are all working towards the same goal.",
+            "Use the tools provided to find the best route.",
+            "Use the tools provided to find the best transportation options.",
+        ],
+        markdown = True,
+        show_members_responses = True,
+        enable_agentic_context = True,
+        success_criteria = "The team has successfully completed the task.",
+    )
 
+transport_agent = build_transport_agent()
+team_leader = build_team_leader([transport_agent])
 
 async def google_maps(query: str) -> str:
     """ Fetches the Google Maps response for a given query. """
@@ -67,22 +75,41 @@ async def google_maps(query: str) -> str:
         await agent.aprint_response(query)
 
 
-def main(start_location: str, end_location: str):
-    
-    task = f"""
+def build_task(start_location: str, end_location: str):
+    return f"""
     You are a team of agents that need to get from {start_location} to {end_location}.
     You need to come up with a detailed plan that includes the cheapest route, transportation options, and any other relevant information.
     You will be using the tools provided to find the best route and transportation options.
     You will also be using the tools provided to reason about the problem and come up with a plan.
     You will be using the tools provided to coordinate with the other agents to ensure that they are all working towards the same goal.
     """
+
+
+async def amain(start_location: str, end_location: str):
+    """
+    Non-blocking version of main - runs the team on the current event loop and returns the plan instead of printing it
+    """
+    with plan_scope(), trip_scope():
+        response = await arun_routed(build_team_leader(), build_task(start_location, end_location))
+    return {
+        "start_location": start_location,
+        "end_location": end_location,
+        "plan": getattr(response, "content", response),
+        "metrics": getattr(response, "metrics", None),
+    }
+
+
+def main(start_location: str, end_location: str):
     
-    team_leader.print_response(
-        task,
-        stream = True,
-        stream_intermediate_steps = True,
-        show_full_reasoning = True,
-    )
+    task = build_task(start_location, end_location)
+    
+    with plan_scope(), trip_scope():
+        build_team_leader().print_response(
+            task,
+            stream = True,
+            stream_intermediate_steps = True,
+            show_full_reasoning = True,
+        )
     
 
 if __name__ == "__main__":
@@ -1,14 +1,19 @@
 from textwrap import dedent
+import re
 import json
+import asyncio
 from typing import Dict, List
 
 from agno.agent import Agent
 from agno.team.team import Team
 #from agno.models.groq import Groq
-from agno.models.openai import OpenAIChat
-from agno.tools.duckduckgo import DuckDuckGoTools
 from agno.tools.reasoning import ReasoningTools
 from pydantic import BaseModel, Field
+from search_cache import CachedDuckDuckGoTools, plan_scope
+from ledger import trip_scope
+from router import model_router, arun_routed
+from taskgraph import TaskGraph
+from trip_log import get_logger
 
 import os 
 from dotenv import load_dotenv
@@ -16,6 +21,8 @@ load_dotenv()
 #GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+log = get_logger("agents_sahil")
+
 
 # ------------------------
 # Schemas
@@ -43,8 +50,8 @@ class HotelInfo(BaseModel):
 transport_agent = Agent(
     name="Transport Agent",
     role="Get transport route, cost, time, and distance between locations.",
-    model=OpenAIChat(id="gpt-4o-mini"),
-    tools=[DuckDuckGoTools()],
+    model=model_router.model("team_member"),
+    tools=[CachedDuckDuckGoTools()],
     instructions=[
         "Use 'duckduckgo_search' for transport info between 'from_location' and 'to_location'.",
         "Extract 'route', 'price', 'time', and 'distance'.",
@@ -56,8 +63,8 @@ transport_agent = Agent(
 location_agent = Agent(
     name="Location Agent",
     role="List top 2 locations around the country for a destination.",
-    model=OpenAIChat(id="gpt-4o-mini"),
-    tools=[DuckDuckGoTools()],
+    model=model_router.model("location"),
+    tools=[CachedDuckDuckGoTools()],
     instructions=[
         "Use 'duckduckgo_search' to find popular tourist attractions in 'destination'.",
         "Return JSON with 'spots' list."
@@ -68,8 +75,8 @@ location_agent = Agent(
 sightseeing_agent = Agent(
     name="Sightseeing Agent",
     role="Provide 2 sightseeing highlights for a location.",
-    model=OpenAIChat(id="gpt-4o-mini"),
-    tools=[DuckDuckGoTools()],
+    model=model_router.model("team_member"),
+    tools=[CachedDuckDuckGoTools()],
     instructions=[
         "Use 'duckduckgo_search' for sightseeing tips in 'location'.",
         "Return JSON as per SightseeingInfo."
@@ -80,8 +87,8 @@ sightseeing_agent = Agent(
 hotel_booking_agent = Agent(
     name="Hotel Booking Agent",
     role="Recommend 2 hotels in a location under budget.",
-    model=OpenAIChat(id="gpt-4o-mini"),
-    tools=[DuckDuckGoTools()],
+    model=model_router.model("team_member"),
+    tools=[CachedDuckDuckGoTools()],
     instructions=[
         "Use 'duckduckgo_search' to find hotels in 'location' under 'budget'.",
         "Extract 'name', 'price', and 'distance'. Return JSON per HotelInfo."
@@ -89,37 +96,152 @@ hotel_booking_agent = Agent(
     markdown=True,
 )
 
+# router role of each member (the rest are "team_member")
+AGENT_ROLES = {"Location Agent": "location"}
+
+
+def routed_copy(agent: Agent):
+    """
+    Copy of a member agent with its model picked by the router now, not at import time
+    """
+    return agent.deep_copy(update={"model": model_router.model(AGENT_ROLES.get(agent.name, "team_member"))})
+
+
 # ------------------------
 # Team Leader
 # ------------------------
-team_leader = Team(
-    name="Team Leader Agent",
-    mode="coordinate",
-    model=OpenAIChat(id="gpt-4o-mini"),
-    members=[transport_agent, location_agent, sightseeing_agent, hotel_booking_agent],
-    tools=[ReasoningTools(add_instructions=True)],
-    instructions=[
-        "1. Call Transport Agent with {'from_location': from, 'to_location': to} to get start-to-destination transport.",
-        "2. Call Location Agent with {'destination': to} to get tourist locations.",
-        "3. From arrival airport to first tourist location: call Transport Agent.",
-        "4. For each spot:",
-        "   a. Call Sightseeing Agent with {'location': spot}.",
-        "   b. Call Hotel Booking Agent with {'location': spot, 'budget': budget}.",
-        "   c. If not first spot, call Transport Agent with {'from_location': previous_spot, 'to_location': spot}.",
-        "5. From last tourist location to departure airport: call Transport Agent.",
-        "6. Finally, call Transport Agent with {'from_location': to, 'to_location': from} to get return trip.",
-        "7. Merge all into a comprehensive JSON travel plan including inter-location transport."
-    ],
-    markdown=True,
-    show_members_responses=True,
-    enable_agentic_context=True,
-    success_criteria="Complete round-trip travel plan with attractions, inter-location transport, hotels, and sightseeing."
-)
+def build_team_leader(members: list = None):
+    """
+    A fresh team per call, so several runs can be scheduled side by side without sharing run state
+    """
+    return Team(
+        name="Team Leader Agent",
+        mode="coordinate",
+        model=model_router.model("team"),
+        members=members or [routed_copy(agent) for agent in (transport_agent, location_agent, sightseeing_agent, hotel_booking_agent)],
+        tools=[ReasoningTools(add_instructions=True)],
+        instructions=[
+            "1. Call Transport Agent with {'from_location': from, 'to_location': to} to get start-to-destination transport.",
+            "2. Call Location Agent with {'destination': to} to get tourist locations.",
+            "3. From arrival airport to first tourist location: call Transport Agent.",
+            "4. For each spot:",
+            "   a. Call Sightseeing Agent with {'location': spot}.",
+            "   b. Call Hotel Booking Agent with {'location': spot, 'budget': budget}.",
+            "   c. If not first spot, call Transport Agent with {'from_location': previous_spot, 'to_location': spot}.",
+            "5. From last tourist location to departure airport: call Transport Agent.",
+            "6. Finally, call Transport Agent with {'from_location': to, 'to_location': from} to get return trip.",
+            "7. Merge all into a comprehensive JSON travel plan including inter-location transport."
+        ],
+        markdown=True,
+        show_members_responses=True,
+        enable_agentic_context=True,
+        success_criteria="Complete round-trip travel plan with attractions, inter-location transport, hotels, and sightseeing."
+    )
+
+team_leader = build_team_leader([transport_agent, location_agent, sightseeing_agent, hotel_booking_agent])
+
+# ------------------------
+# Task Graph Workflow
+# ------------------------
+def parse_json(text):
+    """
+    Parse a member's answer as JSON (it may be wrapped in markdown fences), falling back to the raw text
+    """
+    if not isinstance(text, str):
+        return text
+    match = re.search(r"[\[{].*[\]}]", text, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(0))
+        except json.JSONDecodeError:
+            pass
+    return text.strip()
+
+
+async def ask(agent: Agent, payload: dict):
+    """
+    Call a member agent directly (no leader LLM in between).
+    Each call runs on its own copy of the agent (with a freshly routed model) so concurrent calls don't share run state.
+    """
+    response = await arun_routed(routed_copy(agent), json.dumps(payload))
+    return parse_json(getattr(response, "content", response))
+
+
+async def run_workflow(start_location: str, end_location: str, days: int, budget: str):
+    """
+    The team leader's 7-step workflow as an explicit task graph:
+    outbound / return transport and the location step run first, then the per-spot sightseeing,
+    hotel and inter-spot transport calls fan out concurrently, and everything is merged into the JSON plan.
+    """
+    graph = TaskGraph()
+
+    # 1. start -> destination, 6. destination -> start (independent of everything else)
+    graph.add("outbound", lambda r: ask(transport_agent, {"from_location": start_location, "to_location": end_location}))
+    graph.add("return", lambda r: ask(transport_agent, {"from_location": end_location, "to_location": start_location}))
+
+    # 2. tourist spots - once known, the per-spot work is added to the graph
+    async def spots(results):
+        answer = await ask(location_agent, {"destination": end_location})
+        spots = answer.get("spots", []) if isinstance(answer, dict) else []
+        # the same spot twice would add its nodes twice
+        spots = list(dict.fromkeys(spot.strip() for spot in spots if isinstance(spot, str) and spot.strip())) or [end_location]
+        fan_out(spots)
+        return spots
+
+    def fan_out(spots):
+        legs = []
+        # 3. arrival -> first spot
+        graph.add("arrival", lambda r: ask(transport_agent, {"from_location": end_location, "to_location": spots[0]}), deps=("spots",))
+        for i, spot in enumerate(spots):
+            # 4a / 4b / 4c
+            graph.add(f"sightseeing:{spot}", lambda r, spot=spot: ask(sightseeing_agent, {"location": spot}), deps=("spots",))
+            graph.add(f"hotel:{spot}", lambda r, spot=spot: ask(hotel_booking_agent, {"location": spot, "budget": budget}), deps=("spots",))
+            if i > 0:
+                legs.append(f"transport:{spots[i - 1]}->{spot}")
+                graph.add(legs[-1], lambda r, a=spots[i - 1], b=spot: ask(transport_agent, {"from_location": a, "to_location": b}), deps=("spots",))
+        # 5. last spot -> departure
+        graph.add("departure", lambda r: ask(transport_agent, {"from_location": spots[-1], "to_location": end_location}), deps=("spots",))
+
+        # 7. the merge also waits for the per-spot work
+        deps = ["arrival", "departure", *legs]
+        deps += [f"{kind}:{spot}" for spot in spots for kind in ("sightseeing", "hotel")]
+        graph.add_deps("plan", deps)
+
+    async def merge(results):
+        # registered up front, so a plan (with whatever is known) is produced even if the location step failed
+        spots = results.get("spots") or []
+        get = lambda name: results.get(name, {"error": str(graph.errors.get(name, "not available"))})
+        return {
+            "from": start_location,
+            "to": end_location,
+            "days": days,
+            "budget": budget,
+            "outbound_transport": get("outbound"),
+            "arrival_transport": get("arrival"),
+            "spots": [
+                {
+                    "location": spot,
+                    "sightseeing": get(f"sightseeing:{spot}"),
+                    "hotel": get(f"hotel:{spot}"),
+                    "transport_from_previous": get(f"transport:{spots[i - 1]}->{spot}") if i > 0 else None,
+                }
+                for i, spot in enumerate(spots)
+            ],
+            "departure_transport": get("departure"),
+            "return_transport": get("return"),
+        }
+
+    graph.add("spots", spots)
+    graph.add("plan", merge, deps=("outbound", "return", "spots"), allow_failed=True)
+    results = await graph.run()
+    log.info(f"Workflow timings: {graph.critical_path()}")
+    return results.get("plan")
+
 
 # ------------------------
 # Main Execution
 # ------------------------
-def main(start_location: str, end_location: str, days: int, budget: str):
+def build_task(start_location: str, end_location: str, days: int, budget: str):
     task_dict = {
         "from": start_location,
         "to": end_location,
@@ -128,13 +250,13 @@ def main(start_location: str, end_location: str, days: int, budget: str):
     }
 
     # Convert dict to string for Agno compatibility
-    task = {
+    return {
         "role": "user",
         "content": json.dumps(task_dict)
     }
 
-    response = team_leader.run(task)
 
+def extract_plan(response):
     plan_data = 0
     if hasattr(response, "content"):
         plan_data = response.content
@@ -144,6 +266,28 @@ def main(start_location: str, end_location: str, days: int, budget: str):
         plan_data = response
     
     return plan_data
+
+
+async def amain(start_location: str, end_location: str, days: int, budget: str, use_team_leader: bool = False):
+    """
+    Non-blocking version of main - returns the plan as a dict (or the raw text if it is not valid JSON)
+    """
+    with plan_scope(), trip_scope():
+        if not use_team_leader:
+            return await run_workflow(start_location, end_location, days, budget)
+
+        response = await arun_routed(build_team_leader(), build_task(start_location, end_location, days, budget))
+        return parse_json(extract_plan(response))
+
+
+def main(start_location: str, end_location: str, days: int, budget: str, use_team_leader: bool = False):
+    if not use_team_leader:
+        return asyncio.run(amain(start_location, end_location, days, budget))
+
+    with plan_scope(), trip_scope():
+        response = build_team_leader().run(build_task(start_location, end_location, days, budget))
+
+    return extract_plan(response)
     
 
 
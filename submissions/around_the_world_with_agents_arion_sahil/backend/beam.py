@@ -0,0 +1,182 @@
+import re
+import json
+import asyncio
+
+from config import CONFIG
+from mcp_agents import transport_mcp_agent, location_options_mcp_agent
+from prefetch import plan_leg
+from trip_log import get_logger
+
+log = get_logger("beam")
+
+MONEY = re.compile(r"(?:\$|usd)\s*(\d[\d,]*(?:\.\d+)?)|(\d[\d,]*(?:\.\d+)?)\s*(?:\$|usd)", re.IGNORECASE)
+HOURS = re.compile(r"(\d+(?:\.\d+)?)\s*(?:h|hr|hrs|hour|hours)\b", re.IGNORECASE)
+MINUTES = re.compile(r"(\d+)\s*(?:m|min|mins|minute|minutes)\b", re.IGNORECASE)
+
+
+def amounts(text: str):
+    """
+    Every USD amount mentioned in a text ("$120", "120 USD", "USD 1,200")
+    """
+    return [float((a or b).replace(",", "")) for a, b in MONEY.findall(text or "")]
+
+
+def to_number(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    found = amounts(str(value)) or [float(n.replace(",", "")) for n in re.findall(r"\d[\d,]*(?:\.\d+)?", str(value))]
+    return min(found) if found else None
+
+
+def to_hours(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value or "")
+    hours = sum(float(h) for h in HOURS.findall(text)) + sum(int(m) for m in MINUTES.findall(text)) / 60
+    return hours or None
+
+
+def transport_price(text: str):
+    """
+    (cost, hours) of the cheapest priced mode in a transport agent answer, (None, None) if nothing could be read
+    """
+    try:
+        data = json.loads(re.sub(r"^```(?:json)?|```$", "", (text or "").strip(), flags=re.MULTILINE).strip())
+    except (ValueError, TypeError):
+        data = None
+
+    modes = []
+    if isinstance(data, dict):
+        for details in data.values():
+            if not isinstance(details, dict):
+                continue
+            cost = next((to_number(v) for k, v in details.items() if "cost" in k.lower() or "price" in k.lower()), None)
+            hours = next((to_hours(v) for k, v in details.items() if "time" in k.lower() or "duration" in k.lower()), None)
+            if cost is not None:
+                modes.append((cost, hours))
+    if not modes:
+        costs = amounts(text)
+        return (min(costs), None) if costs else (None, None)
+    return min(modes, key=lambda mode: mode[0])
+
+
+def hotel_price(text: str):
+    """
+    Cheapest USD amount mentioned in a hotel agent answer
+    """
+    costs = amounts(text)
+    return min(costs) if costs else None
+
+
+def price_leg(leg: dict, default_cost: float):
+    """
+    (cost, hours) of a planned leg - cheapest transport plus cheapest hotel, unknown prices count as default_cost
+    """
+    transport_cost, hours = transport_price(leg.get("transport"))
+    hotel_cost = hotel_price(leg.get("hotel"))
+    cost = (transport_cost if transport_cost is not None else default_cost / 2) + (hotel_cost if hotel_cost is not None else default_cost / 2)
+    return cost, hours or 0.0
+
+
+class BeamSearch:
+    """
+    Keeps the `width` best partial itineraries instead of committing to a single next destination.
+
+    Every day, each itinerary is expanded with the top candidate destinations from the location options agent
+    and the new legs (transport, hotel, sightseeing) are planned and priced concurrently. Itineraries whose
+    projected cost for the whole trip exceeds the budget are pruned, the rest are ranked by cost plus
+    travel time (BEAM_HOUR_COST USD per hour). On the last day the leg back to the end location is priced too,
+    so a plan ending far from it is not picked.
+    """
+
+    def __init__(self, width: int = None, branching: int = None, hour_cost: float = None):
+        self.width = CONFIG["BEAM_WIDTH"] if width is None else width
+        self.branching = CONFIG["LOCATION_OPTIONS"] if branching is None else branching
+        self.hour_cost = CONFIG["BEAM_HOUR_COST"] if hour_cost is None else hour_cost
+
+    def extend(self, itinerary: dict, stop: str, leg: dict, default_cost: float):
+        cost, hours = price_leg(leg, default_cost)
+        return {
+            "stops": itinerary["stops"] + [stop],
+            "legs": itinerary["legs"] + [leg],
+            "cost": itinerary["cost"] + cost,
+            "hours": itinerary["hours"] + hours,
+        }
+
+    def score(self, itinerary: dict):
+        return itinerary["cost"] + itinerary.get("return_cost", 0.0) + (itinerary["hours"] + itinerary.get("return_hours", 0.0)) * self.hour_cost
+
+    def prune(self, itineraries: list, budget: float, total_days: int):
+        # the same places in the same final position are interchangeable, keep the best ordering
+        best = {}
+        for itinerary in itineraries:
+            key = (frozenset(itinerary["stops"]), itinerary["stops"][-1])
+            if key not in best or self.score(itinerary) < self.score(best[key]):
+                best[key] = itinerary
+        ranked = sorted(best.values(), key=self.score)
+
+        # projected cost of the whole trip at the pace so far
+        affordable = [i for i in ranked if i["cost"] / len(i["legs"]) * total_days + i.get("return_cost", 0.0) <= budget]
+        if not affordable:
+            log.warning(f"No itinerary fits the budget of {budget}, keeping the cheapest ones")
+            affordable = sorted(ranked, key=lambda i: i["cost"])
+        return affordable[:self.width]
+
+    async def expand(self, itinerary: dict, tourist_destination: str, days_left: int, people: int, default_cost: float):
+        place = itinerary["stops"][-1]
+        options = await location_options_mcp_agent(
+            message = f"Find me the nearest most popular tourist destinations from {place} where tourists can spend the night. Consider that they have {days_left} days left.",
+            place = place,
+            days_left = days_left,
+            tourist_destination = tourist_destination,
+            places_visited = itinerary["stops"],
+            options = self.branching,
+        )
+        options = [option for option in options or [] if option not in itinerary["stops"]]
+        # identical legs from different itineraries are coalesced by the agents' single-flight layer
+        legs = await asyncio.gather(*[plan_leg(place, option, people) for option in options], return_exceptions = True)
+        return [
+            self.extend(itinerary, option, leg, default_cost)
+            for option, leg in zip(options, legs)
+            if not isinstance(leg, BaseException)
+        ]
+
+    async def price_return(self, itinerary: dict, end_location: str, people: int, default_cost: float):
+        place = itinerary["stops"][-1]
+        if place == end_location:
+            return itinerary
+        try:
+            transport = await transport_mcp_agent(
+                message = f"Find me the price (convert to USD) of traveling from {place} to {end_location} using car, train, flight for {people} people. Please return in json format, no unnecessary text to be returned.",
+                people = people,
+            )
+        except Exception as e:
+            log.warning(f"Return leg {place} -> {end_location} could not be priced: {e}")
+            transport = None
+        cost, hours = transport_price(transport)
+        return dict(itinerary, return_cost = default_cost / 2 if cost is None else cost, return_hours = hours or 0.0)
+
+    async def search(self, start_location: str, tourist_destination: str, end_location: str, budget: float, total_days: int, people: int):
+        """
+        Best complete itinerary: {"stops": [...], "legs": [...], "cost": ..., "hours": ...}
+        """
+        default_cost = budget / total_days
+        first = await plan_leg(start_location, tourist_destination, people)
+        beam = [self.extend({"stops": [], "legs": [], "cost": 0.0, "hours": 0.0}, tourist_destination, first, default_cost)]
+
+        for day in range(2, total_days + 1):
+            days_left = total_days - day + 1
+            expansions = await asyncio.gather(*[
+                self.expand(itinerary, tourist_destination, days_left, people, default_cost) for itinerary in beam
+            ], return_exceptions = True)
+            candidates = [c for expansion in expansions if not isinstance(expansion, BaseException) for c in expansion]
+            if not candidates:
+                log.warning(f"No candidates to expand on day {day}, ending the route at {end_location}")
+                leg = await plan_leg(beam[0]["stops"][-1], end_location, people)
+                candidates = [self.extend(beam[0], end_location, leg, default_cost)]
+            if day == total_days:
+                candidates = await asyncio.gather(*[self.price_return(c, end_location, people, default_cost) for c in candidates])
+            beam = self.prune(candidates, budget, total_days)
+            log.info(f"Day {day}: kept {len(beam)} of {len(candidates)} itineraries, best {' -> '.join(beam[0]['stops'])} (${beam[0]['cost']:.0f})")
+
+        return beam[0]
@@ -0,0 +1,276 @@
+import os
+import gzip
+import json
+import time
+import atexit
+import asyncio
+import hashlib
+import functools
+import threading
+from collections import defaultdict, deque
+
+from config import CONFIG
+from singleflight import normalize
+from trip_log import get_logger
+
+log = get_logger("cassette")
+
+
+class CassetteMiss(KeyError):
+    pass
+
+
+class ReplayResponse:
+    """
+    Stand-in for an agno run response served from a cassette
+    """
+
+    def __init__(self, content, metrics=None):
+        self.content = content
+        self.metrics = metrics
+        self.messages = []
+
+
+def to_json(value):
+    """
+    Make agent results JSON friendly (pydantic models are dumped)
+    """
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, dict):
+        return {str(k): to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(v) for v in value]
+    return str(value)
+
+
+class Cassette:
+    """
+    Record / replay store for agent functions, agent (model) runs, MCP tool calls and the final compile.
+
+    mode = "record": every interaction is captured with its timing and written to a gzipped JSONL cassette
+    mode = "replay": interactions are served back from the cassette, no model, MCP or search call is made;
+                     speed = "recorded" keeps the recorded durations, "full" returns immediately
+    mode = "off":    pass-through
+    """
+
+    def __init__(self, path: str = None, mode: str = None, speed: str = None):
+        self.path = CONFIG["CASSETTE_PATH"] if path is None else path
+        self.mode = CONFIG["CASSETTE_MODE"] if mode is None else mode
+        self.speed = CONFIG["CASSETTE_SPEED"] if speed is None else speed
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.entries = []
+        self.tape = defaultdict(deque)
+        self.last = {}
+        self.misses = 0
+        if self.mode == "replay":
+            self.load()
+        elif self.mode == "record":
+            atexit.register(self.save)
+
+    @property
+    def recording(self):
+        return self.mode == "record"
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    @staticmethod
+    def key(kind: str, name: str, request):
+        return hashlib.sha1(repr((kind, name, normalize(to_json(request)))).encode()).hexdigest()[:16]
+
+    ## storage
+    def load(self):
+        if not os.path.exists(self.path):
+            log.warning(f"Cassette {self.path} not found, replaying from an empty cassette")
+            return
+        with gzip.open(self.path, "rt") as f:
+            for line in f:
+                entry = json.loads(line)
+                self.tape[entry["key"]].append(entry)
+        log.info(f"Loaded {sum(len(q) for q in self.tape.values())} interactions from {self.path}")
+
+    def save(self):
+        with self.lock:
+            if not self.entries:
+                return
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with gzip.open(self.path, "wt") as f:
+                for entry in sorted(self.entries, key=lambda e: e["started"]):
+                    f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        log.info(f"Saved {len(self.entries)} interactions to {self.path}")
+
+    def add(self, kind: str, name: str, request, response=None, error=None, started: float = None, channels: dict = None):
+        entry = {
+            "kind": kind,
+            "name": name,
+            "key": self.key(kind, name, request),
+            "request": to_json(request),
+            "response": to_json(response),
+            "error": error,
+            "started": round(started - self.started, 4),
+            "duration": round(time.perf_counter() - started, 4),
+        }
+        if channels:
+            entry["channels"] = channels
+        with self.lock:
+            self.entries.append(entry)
+
+    def take(self, kind: str, name: str, request):
+        """
+        Next recorded entry for a request (identical requests are replayed in recorded order)
+        """
+        key = self.key(kind, name, request)
+        with self.lock:
+            if self.tape[key]:
+                self.last[key] = self.tape[key].popleft()
+            entry = self.last.get(key)
+        if entry is None:
+            self.misses += 1
+            raise CassetteMiss(f"No recorded {kind} interaction for {name}")
+        return entry
+
+    async def wait(self, seconds: float):
+        if self.speed == "recorded" and seconds > 0:
+            await asyncio.sleep(seconds)
+
+    @staticmethod
+    def result_of(entry):
+        if entry.get("error"):
+            raise RuntimeError(f"(replayed) {entry['error']}")
+        return entry["response"]
+
+    ## agent functions (e.g. transport_mcp_agent)
+    def recorded(self, fn):
+        """
+        Decorator for agent functions. Futures passed as keyword arguments (early results such as
+        `first_line`) are recorded with the time they resolved and replayed the same way.
+        """
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if self.mode not in ("record", "replay"):
+                return await fn(*args, **kwargs)
+
+            channels = {name: value for name, value in kwargs.items() if isinstance(value, asyncio.Future)}
+            request = {"args": args, "kwargs": {k: v for k, v in kwargs.items() if k not in channels}}
+
+            if self.replaying:
+                entry = self.take("agent_fn", fn.__name__, request)
+                elapsed = 0.0
+                for name, (value, offset) in sorted(entry.get("channels", {}).items(), key=lambda c: c[1][1]):
+                    await self.wait(offset - elapsed)
+                    elapsed = max(elapsed, offset)
+                    if name in channels and not channels[name].done():
+                        channels[name].set_result(value)
+                await self.wait(entry["duration"] - elapsed)
+                return self.result_of(entry)
+
+            started = time.perf_counter()
+            resolved = {}
+
+            def capture(future, name):
+                if name not in resolved and future.done() and not future.cancelled() and future.exception() is None:
+                    resolved[name] = [to_json(future.result()), round(time.perf_counter() - started, 4)]
+
+            for name, future in channels.items():
+                future.add_done_callback(lambda f, name=name: capture(f, name))
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                # done-callbacks only run on the next loop iteration, pick up channels resolved just before returning
+                for name, future in channels.items():
+                    capture(future, name)
+                self.add("agent_fn", fn.__name__, request, error=repr(e), started=started, channels=resolved)
+                raise
+            for name, future in channels.items():
+                capture(future, name)
+            self.add("agent_fn", fn.__name__, request, response=result, started=started, channels=resolved)
+            return result
+        return wrapper
+
+    ## agent runs (one per agent.arun, i.e. the model conversation incl. tool calls)
+    async def agent_run(self, agent, message, run):
+        """
+        Record or replay a single agent run, `run` is a coroutine function doing the live call
+        """
+        if self.mode not in ("record", "replay"):
+            return await run()
+
+        name = getattr(agent, "name", None) or type(agent).__name__
+        request = {"instructions": getattr(agent, "instructions", None), "message": message}
+
+        if self.replaying:
+            entry = self.take("agent_run", name, request)
+            await self.wait(entry["duration"])
+            content = self.result_of(entry)["content"]
+            response_model = getattr(agent, "response_model", None)
+            if response_model is not None and isinstance(content, dict):
+                content = response_model.model_validate(content)
+            return ReplayResponse(content, self.result_of(entry).get("metrics"))
+
+        started = time.perf_counter()
+        model = getattr(agent, "model", None)
+        request["model"] = getattr(model, "id", None)
+        try:
+            response = await run()
+        except Exception as e:
+            self.add("agent_run", name, request, error=repr(e), started=started)
+            raise
+        self.add("agent_run", name, request, response={
+            "content": getattr(response, "content", response),
+            "metrics": getattr(response, "metrics", None),
+        }, started=started)
+        return response
+
+    ## MCP tool calls
+    def wrap_toolkit(self, toolkit):
+        """
+        Record every call of the toolkit's functions (call after the MCP session has been entered)
+        """
+        if not self.recording:
+            return toolkit
+        for name, function in getattr(toolkit, "functions", {}).items():
+            function.entrypoint = self._record_tool(name, function.entrypoint)
+        return toolkit
+
+    def _record_tool(self, name: str, entrypoint):
+        @functools.wraps(entrypoint)
+        async def wrapper(*args, **kwargs):
+            request = {k: v for k, v in kwargs.items() if k not in ("agent", "team")}
+            started = time.perf_counter()
+            try:
+                result = entrypoint(*args, **kwargs)
+                if asyncio.iscoroutine(result):
+                    result = await result
+            except Exception as e:
+                self.add("tool", name, request, error=repr(e), started=started)
+                raise
+            self.add("tool", name, request, response=result, started=started)
+            return result
+        return wrapper
+
+    ## plain (sync) model calls, e.g. the final compile through llama-index
+    def call(self, name: str, request, fn):
+        if self.replaying:
+            entry = self.take("llm", name, request)
+            if self.speed == "recorded":
+                time.sleep(entry["duration"])
+            return self.result_of(entry)
+        if not self.recording:
+            return fn()
+        started = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            self.add("llm", name, request, error=repr(e), started=started)
+            raise
+        self.add("llm", name, request, response=str(result), started=started)
+        return result
+
+
+cassette = Cassette()
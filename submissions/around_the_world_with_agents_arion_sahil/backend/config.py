@@ -6,4 +6,64 @@ load_dotenv()
 CONFIG = {
     # "GROQ_API_KEY": os.getenv("GROQ_API_KEY"),
     # "GOOGLE_MAPS_API_KEY": os.getenv("GOOGLE_MAPS_API_KEY"),
-}
\ No newline at end of file
+
+    # interactive mode - how many candidate destinations are prefetched while the user decides
+    "PREFETCH_TOP_K": int(os.getenv("PREFETCH_TOP_K", 2)),
+    # seconds a speculative branch may run before it is dropped
+    "PREFETCH_TIMEOUT": float(os.getenv("PREFETCH_TIMEOUT", 300)),
+    # number of candidate destinations offered to the user at every phase
+    "LOCATION_OPTIONS": int(os.getenv("LOCATION_OPTIONS", 3)),
+    # beam search mode - itineraries kept per day, and how many USD an hour of travel is worth when ranking them
+    "BEAM_WIDTH": int(os.getenv("BEAM_WIDTH", 3)),
+    "BEAM_HOUR_COST": float(os.getenv("BEAM_HOUR_COST", 10)),
+
+    # model router - EWMA smoothing factor, how many seconds of latency 1/10 of a cent is worth,
+    # and the error rate above which a model is shed
+    "ROUTER_EWMA_ALPHA": float(os.getenv("ROUTER_EWMA_ALPHA", 0.3)),
+    "ROUTER_COST_WEIGHT": float(os.getenv("ROUTER_COST_WEIGHT", 1.0)),
+    "ROUTER_SHED_ERROR_RATE": float(os.getenv("ROUTER_SHED_ERROR_RATE", 0.5)),
+    # seconds after which latency / error stats have moved half way back to their priors (shed models recover),
+    # and how much better (per place in the role's list) a model must score to replace the role's primary model
+    "ROUTER_DECAY_HALF_LIFE": float(os.getenv("ROUTER_DECAY_HALF_LIFE", 300)),
+    "ROUTER_PREFERENCE_MARGIN": float(os.getenv("ROUTER_PREFERENCE_MARGIN", 0.25)),
+
+    # one fused agent run per day (transport + hotel + sightseeing) instead of three separate agents
+    "FUSED_DAY_PLANNER": os.getenv("FUSED_DAY_PLANNER", "false").lower() in ("1", "true", "yes"),
+    # route-first mode - maximum number of stops asked for in one batched hotel / sightseeing call
+    "BATCH_MAX_STOPS": int(os.getenv("BATCH_MAX_STOPS", 5)),
+
+    # shared DuckDuckGo search cache used by the team agents
+    "SEARCH_CACHE_PATH": os.getenv("SEARCH_CACHE_PATH", ".cache/search.sqlite"),
+    "SEARCH_CACHE_TTL": float(os.getenv("SEARCH_CACHE_TTL", 24 * 60 * 60)),
+
+    # local destination index consulted before the sightseeing / location agents
+    "KNOWLEDGE_PATH": os.getenv("KNOWLEDGE_PATH", ".cache/destinations.sqlite"),
+    "KNOWLEDGE_TTL": float(os.getenv("KNOWLEDGE_TTL", 30 * 24 * 60 * 60)),
+
+    # MCP tool calls - results shared by the agents of a trip (last N trips kept), and the maximum number
+    # of tool calls in one agent run (0 = no limit)
+    "TOOL_CACHE_TRIPS": int(os.getenv("TOOL_CACHE_TRIPS", 64)),
+    "TOOL_CALL_BUDGET": int(os.getenv("TOOL_CALL_BUDGET", 8)),
+
+    # record / replay of model and MCP interactions - mode: off | record | replay, speed: recorded | full
+    "CASSETTE_MODE": os.getenv("CASSETTE_MODE", "off").lower(),
+    "CASSETTE_PATH": os.getenv("CASSETTE_PATH", "cassettes/run.jsonl.gz"),
+    "CASSETTE_SPEED": os.getenv("CASSETTE_SPEED", "recorded").lower(),
+
+    # model spend caps in USD (0 = no cap) - past BUDGET_DEGRADE_AT of a cap, cheaper models and cached data are used
+    "TRIP_BUDGET_USD": float(os.getenv("TRIP_BUDGET_USD", 0.25)),
+    "GLOBAL_BUDGET_USD": float(os.getenv("GLOBAL_BUDGET_USD", 0)),
+    "BUDGET_DEGRADE_AT": float(os.getenv("BUDGET_DEGRADE_AT", 0.8)),
+    # trips whose spend is kept for breakdowns (oldest are dropped)
+    "LEDGER_MAX_TRIPS": int(os.getenv("LEDGER_MAX_TRIPS", 256)),
+
+    # production mode - no rich console rendering of agent responses, diagnostics only through the queued logger
+    "QUIET": os.getenv("QUIET", "false").lower() in ("1", "true", "yes"),
+    "LOG_LEVEL": os.getenv("LOG_LEVEL", "INFO").upper(),
+
+    # event-loop monitor - heartbeat interval and how long the loop may be blocked before its stack is captured (s),
+    # LOOP_ASYNCIO_DEBUG also turns on asyncio's own slow-callback warnings (slower, for diagnosis only)
+    "LOOP_MONITOR_INTERVAL": float(os.getenv("LOOP_MONITOR_INTERVAL", 0.05)),
+    "LOOP_STALL_THRESHOLD": float(os.getenv("LOOP_STALL_THRESHOLD", 0.25)),
+    "LOOP_ASYNCIO_DEBUG": os.getenv("LOOP_ASYNCIO_DEBUG", "false").lower() in ("1", "true", "yes"),
+}
@@ -0,0 +1,155 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import threading
+
+from config import CONFIG
+
+
+def normalize_place(place: str):
+    """
+    Lowercase, punctuation-free place name used as the index key
+    """
+    return " ".join(re.findall(r"\w+", (place or "").lower()))
+
+
+class DestinationIndex:
+    """
+    Local index of destinations (SQLite + FTS5) consulted before any LLM call.
+
+    kind = "sightseeing": attractions, typical durations and fees for a place
+    kind = "next":        candidate next destinations from a place, within a region (scope)
+
+    Exact (normalized) place names are looked up first, then the name before a comma ("Gangtok, Sikkim"
+    finds "Gangtok"), then a full-text match that only accepts stored places covering most of the query's
+    words ("North Goa" does not get "Goa", "Gangtok Airport" does not get "Gangtok").
+    Entries older than KNOWLEDGE_TTL count as misses, unless allow_stale is set (e.g. when the trip is running out of model budget).
+    """
+
+    def __init__(self, path: str = None, ttl: float = None):
+        self.path = CONFIG["KNOWLEDGE_PATH"] if path is None else path
+        self.ttl = CONFIG["KNOWLEDGE_TTL"] if ttl is None else ttl
+        self.lock = threading.Lock()
+        self.db = None
+
+    def _connect(self):
+        if self.db is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    kind TEXT, place TEXT, scope TEXT, content TEXT, updated REAL,
+                    PRIMARY KEY (kind, place, scope)
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(place, kind UNINDEXED, scope UNINDEXED);
+            """)
+        return self.db
+
+    def _find(self, kind: str, place: str, scope: str, allow_stale: bool = False):
+        db = self._connect()
+        key = normalize_place(place)
+        exact = lambda name: db.execute(
+            "SELECT content, updated FROM entries WHERE kind = ? AND place = ? AND scope = ?",
+            (kind, name, scope),
+        ).fetchone()
+        row = exact(key)
+        head = normalize_place((place or "").split(",")[0])
+        if row is None and head and head != key:
+            # "Gangtok, Sikkim" - the part after the comma only qualifies the place
+            row = exact(head)
+        if row is None and key:
+            # full-text candidates, but only places whose every word appears in the query and that cover
+            # more than half of it ("new york" never matches "New Delhi", "goa" does not match "North Goa")
+            words = set(key.split())
+            query = " OR ".join(f'"{word}"' for word in words)
+            candidates = db.execute(
+                """SELECT e.place, e.content, e.updated FROM entries_fts f
+                   JOIN entries e ON e.place = f.place AND e.kind = f.kind AND e.scope = f.scope
+                   WHERE entries_fts MATCH ? AND f.kind = ? AND f.scope = ?
+                   ORDER BY bm25(entries_fts) LIMIT 20""",
+                (f"place : ({query})", kind, scope),
+            ).fetchall()
+            covers = lambda stored: stored <= words and len(stored) * 2 > len(words)
+            row = next((c[1:] for c in candidates if covers(set(c[0].split()))), None)
+        if row and (allow_stale or time.time() - row[1] < self.ttl):
+            return row[0]
+        return None
+
+    def _store(self, kind: str, place: str, scope: str, content: str, updated: float = None):
+        db = self._connect()
+        key = normalize_place(place)
+        db.execute("DELETE FROM entries_fts WHERE place = ? AND kind = ? AND scope = ?", (key, kind, scope))
+        db.execute("INSERT INTO entries_fts (place, kind, scope) VALUES (?, ?, ?)", (key, kind, scope))
+        db.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+            (kind, key, scope, content, time.time() if updated is None else updated),
+        )
+        db.commit()
+
+    ## sightseeing
+    def sightseeing(self, place: str, allow_stale: bool = False):
+        with self.lock:
+            return self._find("sightseeing", place, "", allow_stale)
+
+    def add_sightseeing(self, place: str, content: str):
+        if not content or not content.strip():
+            return
+        with self.lock:
+            self._store("sightseeing", place, "", content)
+
+    ## next destinations
+    def next_destinations(self, place: str, region: str, places_visited: list = (), allow_stale: bool = False):
+        """
+        Known candidate next destinations from a place (best first), excluding visited places
+        """
+        with self.lock:
+            content = self._find("next", place, normalize_place(region), allow_stale)
+        if not content:
+            return []
+        visited = {normalize_place(p) for p in places_visited or () if p} | {normalize_place(place)}
+        return [name for name in json.loads(content) if normalize_place(name) not in visited]
+
+    def add_next_destinations(self, place: str, region: str, candidates: list):
+        """
+        Merge candidates into the known list for (place, region), keeping the existing order first
+        """
+        candidates = [c.strip() for c in candidates if c and c.strip()]
+        if not candidates:
+            return
+        with self.lock:
+            scope = normalize_place(region)
+            row = self._connect().execute(
+                "SELECT content FROM entries WHERE kind = 'next' AND place = ? AND scope = ?",
+                (normalize_place(place), scope),
+            ).fetchone()
+            known = json.loads(row[0]) if row else []
+            seen = {normalize_place(name) for name in known}
+            known += [c for c in candidates if normalize_place(c) not in seen]
+            self._store("next", place, scope, json.dumps(known))
+
+    def build(self, seed_path: str):
+        """
+        Load a prebuilt seed file:
+        {"places": [{"place": "Gangtok", "region": "Sikkim", "sightseeing": "...", "next": ["Pelling", "Lachung"]}]}
+        """
+        with open(seed_path) as f:
+            seed = json.load(f)
+        for entry in seed.get("places", []):
+            if entry.get("sightseeing"):
+                self.add_sightseeing(entry["place"], entry["sightseeing"])
+            if entry.get("next"):
+                self.add_next_destinations(entry["place"], entry.get("region", ""), entry["next"])
+        return len(seed.get("places", []))
+
+
+destination_index = DestinationIndex()
+
+
+if __name__ == "__main__":
+    # python knowledge.py seed.json [seed2.json ...]
+    for seed_path in sys.argv[1:]:
+        print(f"Indexed {destination_index.build(seed_path)} places from {seed_path}")
@@ -0,0 +1,152 @@
+import json
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+from collections import OrderedDict, defaultdict
+
+from config import CONFIG
+
+# trip every model call is charged to, set with trip_scope()
+DEFAULT_TRIP = "default"
+current_trip = contextvars.ContextVar("current_trip", default=DEFAULT_TRIP)
+
+
+class BudgetExceeded(RuntimeError):
+    pass
+
+
+def usage_of(response):
+    """
+    (input_tokens, output_tokens) of an agno run response / llama-index completion, (0, 0) if unknown
+    """
+    metrics = getattr(response, "metrics", None)
+    if isinstance(metrics, dict):
+        def total(name):
+            value = metrics.get(name, 0)
+            return sum(v for v in value if v) if isinstance(value, list) else (value or 0)
+        return int(total("input_tokens")), int(total("output_tokens"))
+
+    # llama-index keeps the provider response in .raw
+    raw = getattr(response, "raw", None)
+    usage = raw.get("usage") if isinstance(raw, dict) else getattr(raw, "usage", None)
+    if usage is not None:
+        get = usage.get if isinstance(usage, dict) else lambda name, default=0: getattr(usage, name, default)
+        return int(get("prompt_tokens", 0) or 0), int(get("completion_tokens", 0) or 0)
+    return 0, 0
+
+
+class CostLedger:
+    """
+    Charges every model call to its trip and enforces per-trip and global spend caps.
+
+    level() is "normal" until DEGRADE_AT of a cap is spent, then "degraded" (the router switches to the
+    cheapest models and agents accept stale local data), and "exhausted" at the cap (model calls raise
+    BudgetExceeded, so agents fall back to whatever cached data they have).
+
+    Calls made outside a trip_scope go to the "default" bucket, which only counts against the global cap.
+    Only the last LEDGER_MAX_TRIPS trips are kept.
+    """
+
+    def __init__(self, trip_budget: float = None, global_budget: float = None, degrade_at: float = None, max_trips: int = None):
+        self.trip_budget = CONFIG["TRIP_BUDGET_USD"] if trip_budget is None else trip_budget
+        self.global_budget = CONFIG["GLOBAL_BUDGET_USD"] if global_budget is None else global_budget
+        self.degrade_at = CONFIG["BUDGET_DEGRADE_AT"] if degrade_at is None else degrade_at
+        self.max_trips = CONFIG["LEDGER_MAX_TRIPS"] if max_trips is None else max_trips
+        self.lock = threading.Lock()
+        self.trips = OrderedDict()
+        self.trip_budgets = {}
+        self.total = 0.0
+
+    def _trip(self, trip: str):
+        if trip not in self.trips:
+            self.trips[trip] = defaultdict(lambda: {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0})
+            while len(self.trips) > self.max_trips:
+                evicted, _ = self.trips.popitem(last=False)
+                self.trip_budgets.pop(evicted, None)
+        self.trips.move_to_end(trip)
+        return self.trips[trip]
+
+    def set_budget(self, trip: str, budget: float):
+        with self.lock:
+            self._trip(trip)
+            self.trip_budgets[trip] = budget
+
+    def charge(self, agent: str, provider: str, model_id: str, input_tokens: int, output_tokens: int, cost: float, trip: str = None):
+        trip = trip or current_trip.get()
+        with self.lock:
+            entry = self._trip(trip)[f"{agent or 'agent'} ({provider}/{model_id})"]
+            entry["calls"] += 1
+            entry["input_tokens"] += input_tokens
+            entry["output_tokens"] += output_tokens
+            entry["cost"] += cost
+            self.total += cost
+
+    def spent(self, trip: str = None):
+        trip = trip or current_trip.get()
+        with self.lock:
+            return sum(entry["cost"] for entry in self.trips.get(trip, {}).values())
+
+    def level(self, trip: str = None):
+        trip = trip or current_trip.get()
+        ratios = []
+        # untagged calls (tests, scripts) share one bucket for the whole process, it has no per-trip cap
+        budget = self.trip_budgets.get(trip, None if trip == DEFAULT_TRIP else self.trip_budget)
+        if budget:
+            ratios.append(self.spent(trip) / budget)
+        if self.global_budget:
+            ratios.append(self.total / self.global_budget)
+        ratio = max(ratios, default=0.0)
+        if ratio >= 1:
+            return "exhausted"
+        if ratio >= self.degrade_at:
+            return "degraded"
+        return "normal"
+
+    def check(self, trip: str = None):
+        """
+        Raise BudgetExceeded if the trip (or the whole process) has hit its cap
+        """
+        trip = trip or current_trip.get()
+        if self.level(trip) == "exhausted":
+            raise BudgetExceeded(f"Spend cap reached for trip {trip} (spent ${self.spent(trip):.4f}, total ${self.total:.4f})")
+
+    def breakdown(self, trip: str = None):
+        """
+        Per-agent cost breakdown of a trip
+        """
+        trip = trip or current_trip.get()
+        with self.lock:
+            agents = {name: dict(entry) for name, entry in self.trips.get(trip, {}).items()}
+        return {
+            "trip": trip,
+            "total_cost": round(sum(entry["cost"] for entry in agents.values()), 6),
+            "agents": agents,
+        }
+
+    def export(self, path: str):
+        """
+        Write the breakdown of every trip to a JSON file
+        """
+        with self.lock:
+            trips = list(self.trips)
+        with open(path, "w") as f:
+            json.dump({"total_cost": round(self.total, 6), "trips": [self.breakdown(trip) for trip in trips]}, f, indent=2)
+
+
+ledger = CostLedger()
+
+
+@contextmanager
+def trip_scope(trip_id: str = None, budget: float = None):
+    """
+    Charge every model call made inside the scope (including tasks started in it) to one trip
+    """
+    trip_id = trip_id or uuid.uuid4().hex[:8]
+    if budget is not None:
+        ledger.set_budget(trip_id, budget)
+    token = current_trip.set(trip_id)
+    try:
+        yield trip_id
+    finally:
+        current_trip.reset(token)
@@ -0,0 +1,341 @@
+"""
+Load-testing harness for the pipeline.
+
+Simulates N concurrent users planning realistic trips and ramps N up, reporting throughput,
+p50/p95/p99 latency, event-loop lag and stalls (with the agent that blocked the loop), open file
+descriptors and subprocess counts per level.
+
+    python loadtest.py --backend fake --levels 1,2,4,8,16
+    CASSETTE_MODE=record python loadtest.py --backend live --seed 1 --cassette cassettes/load.jsonl.gz
+    python loadtest.py --backend replay --seed 1 --cassette cassettes/load.jsonl.gz
+
+A replay only works against a cassette recorded by the load test itself with the same --seed, --levels,
+--trips-per-user and --mode, otherwise the generated trips miss the cassette. Trips whose itinerary
+contains days the agents could not fill ("not available" / "Error getting ...") count as errors.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import beam
+import prefetch
+import pipeline
+from config import CONFIG
+from cassette import cassette
+from ledger import trip_scope
+from loop_monitor import LoopMonitor, monitor, percentile
+
+# (start location, tourist destination, end location)
+REGIONS = [
+    ("Kolkata", "Sikkim", "Kolkata"),
+    ("Delhi", "Rajasthan", "Delhi"),
+    ("Mumbai", "Goa", "Mumbai"),
+    ("Bangalore", "Kerala", "Bangalore"),
+    ("Delhi", "Himachal Pradesh", "Chandigarh"),
+    ("Chennai", "Tamil Nadu", "Chennai"),
+]
+
+
+def random_trip(rng: random.Random):
+    """
+    A trip drawn from a realistic mix - mostly short trips for couples / small families
+    """
+    start, destination, end = rng.choice(REGIONS)
+    days = rng.choices([1, 2, 3, 4, 5, 7], weights=[5, 20, 30, 20, 15, 10])[0]
+    people = rng.choices([1, 2, 3, 4, 6], weights=[15, 40, 15, 20, 10])[0]
+    return {
+        "start_location": start,
+        "tourist_destination": destination,
+        "end_location": end,
+        "budget": float(days * people * rng.choice([100, 200, 400])),
+        "total_days": days,
+        "number_of_people": people,
+    }
+
+
+## backends
+def use_fake_backend(mean_latency: float, seed: int = 0):
+    """
+    Replace the agents used by the pipeline with fakes that only sleep (jittered latency)
+    """
+    rng = random.Random(seed)
+
+    async def latency():
+        await asyncio.sleep(max(0.0, rng.gauss(mean_latency, mean_latency / 3)))
+
+    async def transport(message, people = 1, **kwargs):
+        await latency()
+        return json.dumps({"car": {"time": "5h", "cost": 80}, "train": {"time": "7h", "cost": 20}, "flight": {"time": "1h", "cost": 150}})
+
+    async def sightseeing(message, place, people = 1, **kwargs):
+        await latency()
+        return f"Top attractions in {place}: ..."
+
+    async def hotel(message, place, people = 1, **kwargs):
+        await latency()
+        return f"Hotels in {place}: budget 120$, mid-range 600$, luxury 1600$"
+
+    async def location(message, place, days_left, tourist_destination, places_visited, first_line = None, **kwargs):
+        # the name is known after roughly a third of the answer has streamed
+        await asyncio.sleep(max(0.0, rng.gauss(mean_latency, mean_latency / 3)) / 3)
+        name = f"{tourist_destination} stop {len(places_visited) + 1}"
+        if first_line is not None and not first_line.done():
+            first_line.set_result(name)
+        await latency()
+        return name
+
+    async def location_options(message, place, days_left, tourist_destination, places_visited, options = 3, **kwargs):
+        await latency()
+        return [f"{tourist_destination} stop {len(places_visited) + 1}{suffix}" for suffix in "abcdef"[:options]]
+
+    async def day_planner(start, end, people = 1):
+        await latency()
+        return {"transport": await transport(""), "hotel": await hotel("", end), "sightseeing": await sightseeing("", end)}
+
+    async def stops_batch(places, people = 1):
+        await latency()
+        return {place: {"hotel": f"Hotels in {place}", "sightseeing": f"Top attractions in {place}"} for place in places}
+
+    pipeline.transport_mcp_agent = transport
+    pipeline.sightseeing_mcp_agent = sightseeing
+    pipeline.hotel_booking_mcp_agent = hotel
+    pipeline.location_mcp_agent = location
+    pipeline.day_planner_mcp_agent = day_planner
+    pipeline.stops_batch_mcp_agent = stops_batch
+    # the legs of the beam search are planned through prefetch.plan_leg
+    prefetch.transport_mcp_agent = transport
+    prefetch.sightseeing_mcp_agent = sightseeing
+    prefetch.hotel_booking_mcp_agent = hotel
+    beam.transport_mcp_agent = transport
+    beam.location_options_mcp_agent = location_options
+
+
+def use_replay_backend(path: str, speed: str):
+    """
+    Serve every agent call from a recorded cassette
+    """
+    cassette.path = path
+    cassette.mode = "replay"
+    cassette.speed = speed
+    cassette.load()
+
+
+## process metrics
+def open_fds():
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        try:
+            import psutil
+            return psutil.Process().num_fds()
+        except Exception:
+            return None
+
+
+def subprocess_count():
+    try:
+        import psutil
+        return len(psutil.Process().children(recursive=True))
+    except Exception:
+        pass
+    # linux without psutil - scan /proc for our children
+    try:
+        pid = str(os.getpid())
+        count = 0
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                try:
+                    with open(f"/proc/{entry}/stat") as f:
+                        if f.read().rsplit(")", 1)[1].split()[1] == pid:
+                            count += 1
+                except OSError:
+                    continue
+        return count
+    except OSError:
+        return None
+
+
+class Sampler:
+    """
+    Samples open fds / subprocesses while a level runs (loop lag and stalls come from the loop monitor)
+    """
+
+    def __init__(self):
+        self.fds = []
+        self.subprocesses = []
+        self.running = True
+
+    def sample_process(self):
+        while self.running:
+            self.fds.append(open_fds())
+            self.subprocesses.append(subprocess_count())
+            time.sleep(0.25)
+
+
+## targets
+DEGRADED = ("information not available", "error getting")
+
+
+def trip_error(result):
+    """
+    Why a finished trip counts as failed, None if it succeeded.
+    The pipeline swallows agent errors (including cassette misses) into the itinerary text, so a trip
+    with degraded days is an error, not a fast success.
+    """
+    if not isinstance(result, str) or not result.strip():
+        return "empty itinerary"
+    if result.startswith("Error in trip planning"):
+        return result.split("\n")[0]
+    degraded = sum(result.lower().count(marker) for marker in DEGRADED)
+    if degraded:
+        return f"{degraded} section(s) not available"
+    return None
+
+
+async def headless_user(trips: list, latencies: list, errors: list, mode: str):
+    for trip in trips:
+        started = time.perf_counter()
+        try:
+            # every trip gets its own ledger bucket and tool cache
+            with trip_scope():
+                if mode == "batched":
+                    result = await pipeline.batched_collaboration(**trip)
+                elif mode == "beam":
+                    result = await pipeline.beam_collaboration(**trip)
+                else:
+                    result = await pipeline.multi_agent_collaboration(**trip)
+        except Exception as e:
+            errors.append(repr(e))
+            continue
+        error = trip_error(result)
+        if error:
+            errors.append(error)
+        else:
+            latencies.append(time.perf_counter() - started)
+
+
+def streamlit_user(trips: list, latencies: list, errors: list, mode: str):
+    # run_multi_agent_collaboration swallows errors into the returned text
+    for trip in trips:
+        started = time.perf_counter()
+        result = pipeline.run_multi_agent_collaboration(**trip, mode=mode)
+        error = trip_error(result)
+        if error:
+            errors.append(error)
+        else:
+            latencies.append(time.perf_counter() - started)
+
+
+def run_level(users: int, trips_per_user: int, target: str, mode: str, rng: random.Random):
+    """
+    Run one concurrency level and return its report
+    """
+    trips = [[random_trip(rng) for _ in range(trips_per_user)] for _ in range(users)]
+    latencies, errors = [], []
+    sampler = Sampler()
+    process_thread = threading.Thread(target=sampler.sample_process, daemon=True)
+    process_thread.start()
+
+    misses = cassette.misses
+    started = time.perf_counter()
+    if target == "streamlit":
+        # users are sync script threads sharing the process-wide background loop (already monitored)
+        pipeline.get_background_loop()
+        monitor.reset()
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            list(pool.map(lambda t: streamlit_user(t, latencies, errors, mode), trips))
+        loop_report = monitor.report()
+    else:
+        level_monitor = LoopMonitor()
+
+        async def main():
+            level_monitor.start()
+            await asyncio.gather(*[headless_user(t, latencies, errors, mode) for t in trips])
+            level_monitor.stop()
+        asyncio.run(main())
+        loop_report = level_monitor.report()
+    elapsed = time.perf_counter() - started
+    sampler.running = False
+    process_thread.join()
+
+    fds = [v for v in sampler.fds if v is not None]
+    subprocesses = [v for v in sampler.subprocesses if v is not None]
+    return {
+        "users": users,
+        "trips": len(latencies) + len(errors),
+        "errors": len(errors),
+        "cassette_misses": cassette.misses - misses,
+        "throughput": round(len(latencies) / elapsed, 3) if elapsed else None,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "loop_lag_p99": loop_report["loop_lag_p99"],
+        "loop_lag_max": loop_report["loop_lag_max"],
+        "stalls": loop_report["stalls"],
+        "stalls_by_agent": loop_report["stalls_by_agent"],
+        "worst_stalls": loop_report["worst_stalls"],
+        "max_open_fds": max(fds) if fds else None,
+        "max_subprocesses": max(subprocesses) if subprocesses else None,
+        "sample_errors": errors[:3],
+    }
+
+
+def print_report(reports: list):
+    columns = ["users", "trips", "errors", "cassette_misses", "throughput", "p50", "p95", "p99", "loop_lag_p99", "loop_lag_max", "stalls", "max_open_fds", "max_subprocesses"]
+    print("\n" + " | ".join(f"{c:>12}" for c in columns))
+    for report in reports:
+        row = []
+        for c in columns:
+            value = report[c]
+            row.append(f"{value:>12.3f}" if isinstance(value, float) else f"{str(value):>12}")
+        print(" | ".join(row))
+        for agent, stalls in report["stalls_by_agent"].items():
+            print(f"{'':>12}   loop blocked {stalls['stalls']}x for {stalls['stalled_for']:.3f}s by {agent}")
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Concurrent-user load test for the itinerary pipeline")
+    parser.add_argument("--backend", choices=["fake", "replay", "live"], default="fake")
+    parser.add_argument("--target", choices=["headless", "streamlit"], default="headless", help="headless: multi_agent_collaboration on one loop, streamlit: run_multi_agent_collaboration from script threads")
+    parser.add_argument("--mode", choices=["daily", "batched", "beam"], default="daily")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="comma separated numbers of concurrent users")
+    parser.add_argument("--trips-per-user", type=int, default=2)
+    parser.add_argument("--fake-latency", type=float, default=0.5, help="mean latency (s) of a fake agent call")
+    parser.add_argument("--cassette", default=cassette.path, help="for --backend replay: a cassette recorded by this load test (CASSETTE_MODE=record --backend live) with the same --seed")
+    parser.add_argument("--speed", choices=["recorded", "full"], default="recorded")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the reports to this file")
+    parser.add_argument("--pretty", action="store_true", help="keep rendering agent responses to the console (off by default, it skews latency)")
+    args = parser.parse_args(argv)
+
+    CONFIG["QUIET"] = not args.pretty
+
+    if args.backend == "fake":
+        use_fake_backend(args.fake_latency, args.seed)
+    elif args.backend == "replay":
+        use_replay_backend(args.cassette, args.speed)
+    elif cassette.recording:
+        cassette.path = args.cassette
+
+    rng = random.Random(args.seed)
+    reports = []
+    for users in [int(level) for level in args.levels.split(",") if level.strip()]:
+        print(f"Running {users} concurrent user(s)...")
+        reports.append(run_level(users, args.trips_per_user, args.target, args.mode, rng))
+        print_report(reports[-1:])
+
+    print_report(reports)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+    return reports
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
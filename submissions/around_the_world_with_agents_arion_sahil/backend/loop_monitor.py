@@ -0,0 +1,191 @@
+import os
+import sys
+import math
+import time
+import asyncio
+import threading
+import traceback
+from collections import defaultdict, deque
+
+from config import CONFIG
+from ledger import current_trip
+from trip_log import get_logger
+
+log = get_logger("loop_monitor")
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values: list, q: float):
+    if not values:
+        return None
+    # nearest rank
+    values = sorted(values)
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def attribute(frames: list):
+    """
+    (agent, where) for a captured loop-thread stack (outermost frame first):
+    agent is the innermost agent / pipeline function on the stack, where is the innermost line of our own code
+    """
+    agent, where = None, None
+    for frame in frames:
+        if not frame.filename.startswith(BACKEND_DIR) or frame.filename == __file__:
+            continue
+        where = f"{os.path.basename(frame.filename)}:{frame.lineno} in {frame.name}"
+        if frame.name.endswith(("_agent", "_collaboration")) or frame.name in ("plan_leg", "plan_route", "run_workflow", "ask"):
+            agent = frame.name
+    return agent or "unknown", where or "outside the backend (library / event loop internals)"
+
+
+class LoopMonitor:
+    """
+    Event-loop lag monitor and blocking-call detector.
+
+    A heartbeat coroutine on the monitored loop samples how late its sleeps wake up (loop lag).
+    A watchdog thread checks the heartbeat; once the loop has not come back for LOOP_STALL_THRESHOLD
+    seconds it captures the loop thread's stack, so the blocking call is caught while it is still
+    running, and attributes it to the agent / pipeline function and the line of our code it came from.
+    Stalls are logged to the trip log and kept for the reports (the last `max_samples` lag samples and
+    `max_stalls` stalls, the monitor of the shared loop runs for the life of the process).
+    """
+
+    def __init__(self, interval: float = None, threshold: float = None, asyncio_debug: bool = None,
+                 max_samples: int = 20 * 60 * 10, max_stalls: int = 1000):
+        self.interval = CONFIG["LOOP_MONITOR_INTERVAL"] if interval is None else interval
+        self.threshold = CONFIG["LOOP_STALL_THRESHOLD"] if threshold is None else threshold
+        self.asyncio_debug = CONFIG["LOOP_ASYNCIO_DEBUG"] if asyncio_debug is None else asyncio_debug
+        self.lock = threading.Lock()
+        self.lags = deque(maxlen=max_samples)
+        self.stalls = deque(maxlen=max_stalls)
+        self.open_stall = None
+        self.loop = None
+        self.loop_thread_id = None
+        self.beat = None
+        self.running = False
+        self.task = None
+        self.watchdog = None
+
+    ## loop side
+    async def _heartbeat(self):
+        self.loop_thread_id = threading.get_ident()
+        loop = asyncio.get_running_loop()
+        while self.running:
+            before = loop.time()
+            beat = self.beat = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - before - self.interval)
+            with self.lock:
+                self.lags.append(lag)
+                # the watchdog caught this stall while it was happening, now we know how long it lasted
+                if self.open_stall is not None and self.open_stall[0] == beat:
+                    self.open_stall[1]["stalled_for"] = round(lag, 4)
+                self.open_stall = None
+
+    ## watchdog side
+    def _current_trip(self, frame):
+        # the trip of the task hogging the loop - task contexts are only exposed from python 3.12,
+        # before that look for the trip_id of an enclosing frame (e.g. pipeline.in_trip)
+        try:
+            task = asyncio.current_task(self.loop)
+            get_context = getattr(task, "get_context", None)
+            if get_context is not None:
+                return get_context().get(current_trip)
+        except Exception:
+            pass
+        while frame is not None:
+            trip_id = frame.f_locals.get("trip_id") if frame.f_code.co_filename.startswith(BACKEND_DIR) else None
+            if isinstance(trip_id, str):
+                return trip_id
+            frame = frame.f_back
+        return None
+
+    def _watch(self):
+        captured_beat = None
+        while self.running:
+            time.sleep(min(self.interval, self.threshold) / 2)
+            beat = self.beat
+            if beat is None or beat == captured_beat:
+                continue
+            stalled = time.perf_counter() - beat - self.interval
+            if stalled < self.threshold:
+                continue
+
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            frames = traceback.extract_stack(frame)
+            agent, where = attribute(frames)
+            stall = {
+                "at": round(time.time(), 3),
+                "stalled_for": round(stalled, 4),
+                "agent": agent,
+                "where": where,
+                "trip": self._current_trip(frame),
+                "stack": "".join(traceback.format_list(frames[-12:])),
+            }
+            captured_beat = beat
+            with self.lock:
+                self.stalls.append(stall)
+                self.open_stall = (beat, stall)
+            log.warning(
+                f"Event loop blocked for more than {stalled:.3f}s by {agent} at {where}\n{stall['stack']}",
+                extra={"trip": stall["trip"] or "unknown"},
+            )
+
+    ## control
+    def start(self, loop: asyncio.AbstractEventLoop = None):
+        """
+        Start monitoring a loop. From inside the loop call it without arguments, from another thread pass the loop.
+        """
+        if self.running:
+            return self
+        self.running = True
+        if loop is None:
+            self.loop = asyncio.get_running_loop()
+            self.task = self.loop.create_task(self._heartbeat())
+        else:
+            self.loop = loop
+            self.task = asyncio.run_coroutine_threadsafe(self._heartbeat(), loop)
+        if self.asyncio_debug:
+            # asyncio's own slow-callback warnings (debug mode slows the loop down, keep it for diagnosis)
+            self.loop.call_soon_threadsafe(self.loop.set_debug, True)
+            self.loop.slow_callback_duration = self.threshold
+        self.watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self.watchdog.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.watchdog is not None:
+            self.watchdog.join(timeout=1)
+
+    def reset(self):
+        with self.lock:
+            self.lags.clear()
+            self.stalls.clear()
+
+    ## reports
+    def stalls_for(self, trip: str):
+        with self.lock:
+            return [stall for stall in self.stalls if stall["trip"] == trip]
+
+    def report(self):
+        with self.lock:
+            lags, stalls = list(self.lags), list(self.stalls)
+        by_agent = defaultdict(lambda: {"stalls": 0, "stalled_for": 0.0})
+        for stall in stalls:
+            by_agent[stall["agent"]]["stalls"] += 1
+            by_agent[stall["agent"]]["stalled_for"] = round(by_agent[stall["agent"]]["stalled_for"] + stall["stalled_for"], 4)
+        return {
+            "loop_lag_p50": percentile(lags, 50),
+            "loop_lag_p99": percentile(lags, 99),
+            "loop_lag_max": max(lags) if lags else None,
+            "stalls": len(stalls),
+            "stalls_by_agent": dict(by_agent),
+            "worst_stalls": sorted(stalls, key=lambda s: -s["stalled_for"])[:3],
+        }
+
+
+monitor = LoopMonitor()
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+
+class BackgroundLoop:
+    """
+    A process-wide event loop running forever on its own daemon thread.
+    Sync code (e.g. the Streamlit script thread) submits coroutines to it and gets futures back,
+    so anything async (pools, MCP sessions, HTTP clients, in-flight requests) outlives a single run.
+    """
+
+    def __init__(self, name: str = "agents-loop"):
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self.ready.set)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """
+        Schedule a coroutine on the background loop, returns a concurrent.futures.Future
+        """
+        if threading.current_thread() is self.thread:
+            raise RuntimeError("submit() called from the background loop itself, await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: float = None):
+        """
+        Submit a coroutine and block until it is done.
+        If the waiting thread is interrupted (Streamlit stopping / rerunning the script, a timeout, Ctrl-C)
+        the coroutine is cancelled too, instead of being left running on the loop.
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def stop(self):
+        """
+        Cancel outstanding tasks and stop the loop
+        """
+        def _cancel_all():
+            for task in asyncio.all_tasks(self.loop):
+                task.cancel()
+            self.loop.call_soon(self.loop.stop)
+
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(_cancel_all)
+            self.thread.join(timeout=5)
@@ -4,19 +4,29 @@ import sys
 import traceback
 import platform
 from textwrap import dedent
+from typing import List
 from dotenv import load_dotenv
+from pydantic import BaseModel, Field
 
 from agno.agent import Agent
-from agno.models.openai import OpenAIChat
-from agno.models.groq import Groq
 from agno.tools.mcp import MCPTools, MultiMCPTools
-from agno.utils.pprint import apprint_run_response
+
+from router import model_router, arun_routed
+from singleflight import coalesce
+from streaming import stream_agent, FirstLineParser, resolve
+from knowledge import destination_index, normalize_place
+from cassette import cassette
+from tool_cache import guard_toolkit
+from ledger import ledger
+from trip_log import get_logger, show_response
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 
+log = get_logger("mcp_agents")
+
 # windows compatibility fix
 if platform.system() == "Windows":
     # setting the event loop policy for Windows
@@ -45,7 +55,7 @@ def extract_text_from_response(response_stream):
         else:
             return str(response_stream)
     except Exception as e:
-        print(f"Error extracting text from response: {e}")
+        log.warning(f"Error extracting text from response: {e}")
         return None
 
 def get_mcp_command():
@@ -71,18 +81,20 @@ async def test_mcp_connection():
     commands = get_mcp_command()
     for cmd in commands:
         try:
-            print(f"Testing MCP command: {cmd}")
+            log.debug(f"Testing MCP command: {cmd}")
             mcp_tools = MCPTools(cmd)
             async with mcp_tools:
-                print(f"Successfully connected with command: {cmd}")
+                log.debug(f"Successfully connected with command: {cmd}")
                 return cmd
         except Exception as e:
-            print(f"Failed with command {cmd}: {e}")
+            log.warning(f"Failed with command {cmd}: {e}")
             continue
     return None
 
 
 ## transport agent
+@coalesce
+@cassette.recorded
 async def transport_mcp_agent(message: str, people: int = 1):
     response_text = None
     agent = None
@@ -91,20 +103,20 @@ async def transport_mcp_agent(message: str, people: int = 1):
         # testing MCP connection
         working_cmd = await test_mcp_connection()
         if not working_cmd:
-            print("No working MCP command found, using fallback agent without MCP tools")
+            log.warning("No working MCP command found, using fallback agent without MCP tools")
             return await transport_fallback_agent(message, people)
         
-        print(f"Using MCP command: {working_cmd}")
+        log.debug(f"Using MCP command: {working_cmd}")
         mcp_tools = MCPTools(working_cmd)
         
         async with mcp_tools:
-            print("MCPTools context entered successfully")
-            
-            if not OPENAI_API_KEY:
-                raise ValueError("OPENAI_API_KEY not found in environment variables")
+        
+            guard_toolkit(cassette.wrap_toolkit(mcp_tools))
+            log.debug("MCPTools context entered successfully")
             
             agent = Agent(
-                model=OpenAIChat(id="gpt-4o-mini", api_key=OPENAI_API_KEY),
+                name="Transport Agent",
+                model=model_router.model("transport"),
                 instructions=dedent(f"""\
                     You are a travel agent. Your task is to find the best transport options for {people} number of people.\
                     You will find the exact time and cost of traveling (convert to USD) - for each of the following modes:\
@@ -121,11 +133,11 @@ async def transport_mcp_agent(message: str, people: int = 1):
                 tools=[mcp_tools],
                 markdown=True,
             )
-            print("Transport Agent initialized!")
+            log.debug("Transport Agent initialized!")
 
             try:
-                response_stream = await agent.arun(message, stream=False)
-                await apprint_run_response(response_stream, markdown=True)
+                response_stream = await stream_agent(agent, message)
+                await show_response(response_stream)
                 response_text = extract_text_from_response(response_stream)
                 
             finally:
@@ -135,15 +147,15 @@ async def transport_mcp_agent(message: str, people: int = 1):
                             await agent.close()
                         else:
                             agent.close()
-                        print("Agent closed successfully")
+                        log.debug("Agent closed successfully")
                     except Exception as e:
-                        print(f"Error closing agent: {e}")
+                        log.warning(f"Error closing agent: {e}")
         
-        print("MCPTools context exited.")
+        log.debug("MCPTools context exited.")
 
     except Exception as e:
         # fallback to agent without MCP tools
-        print("Falling back to agent without MCP tools")
+        log.warning("Falling back to agent without MCP tools")
         response_text = await transport_fallback_agent(message, people)
     
     return response_text
@@ -154,11 +166,9 @@ async def transport_fallback_agent(message: str, people: int = 1):
     Fallback transport agent without MCP tools
     """
     try:
-        if not GROQ_API_KEY:
-            raise ValueError("GROQ_API_KEY not found in environment variables")
-        
         agent = Agent(
-            model=Groq(id="llama-3.3-70b-versatile", api_key=GROQ_API_KEY),
+            name="Transport Fallback Agent",
+            model=model_router.model("fallback"),
             instructions=dedent(f"""\
                 You are a travel agent. Your task is to find the best transport options for {people} number of people.\
                 You will find the exact time and cost of traveling (convert to USD) - for each of the following modes:\
@@ -175,7 +185,7 @@ async def transport_fallback_agent(message: str, people: int = 1):
             markdown=True,
         )
         
-        response_stream = await agent.arun(message, stream=False)
+        response_stream = await arun_routed(agent, message, stream=False)
         response_text = extract_text_from_response(response_stream)
         
         
@@ -186,29 +196,34 @@ async def transport_fallback_agent(message: str, people: int = 1):
                 else:
                     agent.close()
             except Exception as e:
-                print(f"Error closing fallback agent: {e}")
+                log.warning(f"Error closing fallback agent: {e}")
         
         return response_text
         
     except Exception as e:
-        print(f"Error in fallback transport agent: {e}")
+        log.warning(f"Error in fallback transport agent: {e}")
         return None
 
 
 ## hotel booking agent
+@coalesce
+@cassette.recorded
 async def hotel_booking_mcp_agent(message: str, place: str, people: int = 1):
     response_text = None
     try:
         working_cmd = await test_mcp_connection()
         if not working_cmd:
-            print("No working MCP command found, using fallback agent without MCP tools")
+            log.warning("No working MCP command found, using fallback agent without MCP tools")
             return await hotel_booking_fallback_agent(message, place, people)
         
         async with MultiMCPTools([working_cmd]) as mcptools:
+        
+            guard_toolkit(cassette.wrap_toolkit(mcptools))
             
-            print("MCPTools initializing for Hotel Booking Agent...")
+            log.debug("MCPTools initializing for Hotel Booking Agent...")
             agent = Agent(
-                model=OpenAIChat(id="gpt-4o-mini", api_key=OPENAI_API_KEY),
+                name="Hotel Booking Agent",
+                model=model_router.model("hotel"),
                 instructions=dedent(f"""\
                     You are a hotel booking assistant. Your task is to suggest the best hotel options for {people} people at {place}.\
                     
@@ -225,11 +240,11 @@ async def hotel_booking_mcp_agent(message: str, place: str, people: int = 1):
                 tools=[mcptools],
                 markdown=True,
             )
-            print("Hotel Booking Agent initialized!")
+            log.debug("Hotel Booking Agent initialized!")
             
             try:
-                response_stream = await agent.arun(message, stream=False)
-                await apprint_run_response(response_stream, markdown=True)
+                response_stream = await stream_agent(agent, message)
+                await show_response(response_stream)
                 
                 # Extract the actual text content
                 response_text = extract_text_from_response(response_stream)
@@ -241,14 +256,14 @@ async def hotel_booking_mcp_agent(message: str, place: str, people: int = 1):
                             await agent.close()
                         else:
                             agent.close()
-                        print("Agent closed")
+                        log.debug("Agent closed")
                     except Exception as e:
-                        print(f"Error closing agent: {e}")
+                        log.warning(f"Error closing agent: {e}")
                     
-        print("MCPTools context exited.")
+        log.debug("MCPTools context exited.")
     
     except Exception as e:
-        print(f"Error occurred in hotel_booking_agent: {e}")
+        log.warning(f"Error occurred in hotel_booking_agent: {e}")
         response_text = await hotel_booking_fallback_agent(message, place, people)
         
     return response_text
@@ -260,7 +275,8 @@ async def hotel_booking_fallback_agent(message: str, place: str, people: int = 1
     """
     try:
         agent = Agent(
-            model=Groq(id="llama-3.3-70b-versatile", api_key=GROQ_API_KEY),
+            name="Hotel Booking Fallback Agent",
+            model=model_router.model("fallback"),
             instructions=dedent(f"""\
                 You are a hotel booking assistant. Your task is to suggest the best hotel options for {people} people at {place}.\
                     
@@ -277,7 +293,7 @@ async def hotel_booking_fallback_agent(message: str, place: str, people: int = 1
             markdown=True,
         )
         
-        response_stream = await agent.arun(message, stream=False)
+        response_stream = await arun_routed(agent, message, stream=False)
         response_text = extract_text_from_response(response_stream)
         
         if hasattr(agent, 'close') and callable(agent.close):
@@ -287,29 +303,41 @@ async def hotel_booking_fallback_agent(message: str, place: str, people: int = 1
                 else:
                     agent.close()
             except Exception as e:
-                print(f"Error closing fallback agent: {e}")
+                log.warning(f"Error closing fallback agent: {e}")
         
         return response_text
         
     except Exception as e:
-        print(f"Error in fallback hotel booking agent: {e}")
+        log.warning(f"Error in fallback hotel booking agent: {e}")
         return None
 
 
 ## sightseeing agent
+@coalesce
+@cassette.recorded
 async def sightseeing_mcp_agent(message: str, place: str, people: int = 1):
     response_text = None
+    
+    # local index first - popular places are answered without any model / Maps round trip
+    known = destination_index.sightseeing(place, allow_stale = ledger.level() != "normal")
+    if known:
+        log.info(f"Sightseeing for {place} served from the local index")
+        return known
+    
     try:
         working_cmd = await test_mcp_connection()
         if not working_cmd:
-            print("No working MCP command found, using fallback agent without MCP tools")
+            log.warning("No working MCP command found, using fallback agent without MCP tools")
             return await sightseeing_fallback_agent(message, place, people)
         
         async with MCPTools(working_cmd) as mcptools:
+        
+            guard_toolkit(cassette.wrap_toolkit(mcptools))
             
-            print("MCPTools initializing for Sightseeing Agent...")
+            log.debug("MCPTools initializing for Sightseeing Agent...")
             agent = Agent(
-                model=OpenAIChat(id="gpt-4o-mini", api_key=OPENAI_API_KEY),
+                name="Sightseeing Agent",
+                model=model_router.model("sightseeing"),
                 instructions=dedent(f"""\
                 You are a local tour guide for {place}. Your task is to recommend the best sightseeing locations.\
                 There are {people} people in the group.\
@@ -328,15 +356,18 @@ async def sightseeing_mcp_agent(message: str, place: str, people: int = 1):
                 tools=[mcptools],
                 markdown=True,
             )
-            print("Sightseeing Agent initialized!")
+            log.debug("Sightseeing Agent initialized!")
             
             try:
-                response_stream = await agent.arun(message, stream=False)
-                await apprint_run_response(response_stream, markdown=True)
+                response_stream = await stream_agent(agent, message)
+                await show_response(response_stream)
                 
                 # Extract the actual text content
                 response_text = extract_text_from_response(response_stream)
                 
+                # feeding the local index with the live answer
+                destination_index.add_sightseeing(place, response_text)
+                
             finally:
                 if hasattr(agent, 'close') and callable(agent.close):
                     try:
@@ -344,14 +375,14 @@ async def sightseeing_mcp_agent(message: str, place: str, people: int = 1):
                             await agent.close()
                         else:
                             agent.close()
-                        print("Agent closed")
+                        log.debug("Agent closed")
                     except Exception as e:
-                        print(f"Error closing agent: {e}")
+                        log.warning(f"Error closing agent: {e}")
                     
-        print("MCPTools context exited.")
+        log.debug("MCPTools context exited.")
     
     except Exception as e:
-        print(f"Error occurred in sightseeing_agent: {e}")
+        log.warning(f"Error occurred in sightseeing_agent: {e}")
         response_text = await sightseeing_fallback_agent(message, place, people)
         
     return response_text
@@ -363,7 +394,8 @@ async def sightseeing_fallback_agent(message: str, place: str, people: int = 1):
     """
     try:
         agent = Agent(
-            model=Groq(id="llama-3.3-70b-versatile", api_key=GROQ_API_KEY),
+            name="Sightseeing Fallback Agent",
+            model=model_router.model("fallback"),
             instructions=dedent(f"""\
                 You are a local tour guide for {place}. Your task is to recommend the best sightseeing locations.\
                 There are {people} people in the group.\
@@ -382,7 +414,7 @@ async def sightseeing_fallback_agent(message: str, place: str, people: int = 1):
             markdown=True,
         )
         
-        response_stream = await agent.arun(message, stream=False)
+        response_stream = await arun_routed(agent, message, stream=False)
         response_text = extract_text_from_response(response_stream)
         
         if hasattr(agent, 'close') and callable(agent.close):
@@ -392,29 +424,45 @@ async def sightseeing_fallback_agent(message: str, place: str, people: int = 1):
                 else:
                     agent.close()
             except Exception as e:
-                print(f"Error closing fallback agent: {e}")
+                log.warning(f"Error closing fallback agent: {e}")
         
         return response_text
         
     except Exception as e:
-        print(f"Error in fallback sightseeing agent: {e}")
+        log.warning(f"Error in fallback sightseeing agent: {e}")
         return None
 
 
 ## location agent
-async def location_mcp_agent(message: str, place: str, days_left: int, tourist_destination: str, places_visited: list):
+@coalesce
+@cassette.recorded
+async def location_mcp_agent(message: str, place: str, days_left: int, tourist_destination: str, places_visited: list, first_line: asyncio.Future = None):
+    """
+    `first_line` (optional) is resolved with the recommended destination as soon as the model has streamed it
+    """
     response_text = None
+    
+    # local index first - popular regions are answered without any model / Maps round trip
+    known = destination_index.next_destinations(place, tourist_destination, places_visited, allow_stale = ledger.level() != "normal")
+    if known:
+        log.info(f"Next destination from {place} served from the local index")
+        resolve(first_line, known[0])
+        return known[0]
+    
     try:
         working_cmd = await test_mcp_connection()
         if not working_cmd:
-            print("No working MCP command found, using fallback agent without MCP tools")
-            return await location_fallback_agent(message, place, days_left)
+            log.warning("No working MCP command found, using fallback agent without MCP tools")
+            return await location_fallback_agent(message, place, days_left, tourist_destination, places_visited, first_line)
         
         async with MCPTools(working_cmd) as mcptools:
+        
+            guard_toolkit(cassette.wrap_toolkit(mcptools))
             
-            print("MCPTools initializing for Location Agent...")
+            log.debug("MCPTools initializing for Location Agent...")
             agent = Agent(
-                model=OpenAIChat(id="gpt-4o-mini", api_key=OPENAI_API_KEY),
+                name="Location Agent",
+                model=model_router.model("location"),
                 instructions=dedent(f"""\
                     You are a travel agent. The tourists have {days_left} days left in their trip.\
                     Starting from {place}, recommend the next best tourist destination they should visit.\
@@ -432,15 +480,19 @@ async def location_mcp_agent(message: str, place: str, days_left: int, tourist_d
                 tools=[mcptools],
                 markdown=True,
             )
-            print("Location Agent initialized!")
+            log.debug("Location Agent initialized!")
             
             try:
-                response_stream = await agent.arun(message, stream=False)
-                await apprint_run_response(response_stream, markdown=True)
+                response_stream = await stream_agent(agent, message, [FirstLineParser(first_line)] if first_line else [])
+                await show_response(response_stream)
                 
                 # extracting the actual text content
                 response_text = extract_text_from_response(response_stream)
                 
+                # feeding the local index with the live answer
+                if response_text and response_text.strip():
+                    destination_index.add_next_destinations(place, tourist_destination, [FirstLineParser.clean(response_text.strip().split('\n')[0])])
+                
             finally:
                 if hasattr(agent, 'close') and callable(agent.close):
                     try:
@@ -448,26 +500,27 @@ async def location_mcp_agent(message: str, place: str, days_left: int, tourist_d
                             await agent.close()
                         else:
                             agent.close()
-                        print("Agent closed")
+                        log.debug("Agent closed")
                     except Exception as e:
-                        print(f"Error closing agent: {e}")
+                        log.warning(f"Error closing agent: {e}")
                     
-        print("MCPTools context exited.")
+        log.debug("MCPTools context exited.")
     
     except Exception as e:
-        print(f"Error occurred in location_agent: {e}")
-        response_text = await location_fallback_agent(message, place, days_left, tourist_destination)
+        log.warning(f"Error occurred in location_agent: {e}")
+        response_text = await location_fallback_agent(message, place, days_left, tourist_destination, places_visited, first_line)
         
     return response_text
 
 ## fallback location agent
-async def location_fallback_agent(message: str, place: str, days_left: int, tourist_destination: str, places_visited: list):
+async def location_fallback_agent(message: str, place: str, days_left: int, tourist_destination: str, places_visited: list, first_line: asyncio.Future = None):
     """
     Fallback location agent without MCP tools
     """
     try:
         agent = Agent(
-            model=Groq(id="llama-3.3-70b-versatile", api_key=GROQ_API_KEY),
+            name="Location Fallback Agent",
+            model=model_router.model("fallback_small"),
             instructions=dedent(f"""\
                 You are a travel agent. The tourists have {days_left} days left in their trip.\
                 Starting from {place}, recommend the next best tourist destination they should visit.\
@@ -485,7 +538,7 @@ async def location_fallback_agent(message: str, place: str, days_left: int, tour
             markdown=True,
         )
         
-        response_stream = await agent.arun(message, stream=False)
+        response_stream = await stream_agent(agent, message, [FirstLineParser(first_line)] if first_line else [])
         response_text = extract_text_from_response(response_stream)
         
         if hasattr(agent, 'close') and callable(agent.close):
@@ -495,13 +548,304 @@ async def location_fallback_agent(message: str, place: str, days_left: int, tour
                 else:
                     agent.close()
             except Exception as e:
-                print(f"Error closing fallback agent: {e}")
+                log.warning(f"Error closing fallback agent: {e}")
         
         return response_text
         
     except Exception as e:
-        print(f"Error in fallback location agent: {e}")
+        log.warning(f"Error in fallback location agent: {e}")
+        return None
+
+
+class DayPlan(BaseModel):
+    transport: str = Field(..., description="JSON with car, train (railway station names) and flight (airport names) options, each with exact time and cost in USD")
+    hotel: str = Field(..., description="Budget, mid-range and luxury hotel options with amenities and prices in USD")
+    sightseeing: str = Field(..., description="Top 4-5 attractions with description, visit duration, entry fees in USD and best time to visit")
+
+
+class StopInfo(BaseModel):
+    place: str = Field(..., description="Name of the stop, exactly as given")
+    hotel: str = Field(..., description="Budget, mid-range and luxury hotel options with amenities and prices in USD")
+    sightseeing: str = Field(..., description="Top 4 attractions with description, visit duration, entry fees in USD and best time to visit")
+
+
+class StopsPlan(BaseModel):
+    stops: List[StopInfo]
+
+
+## batched stops agent - hotels and sightseeing for several places in one run
+@coalesce
+@cassette.recorded
+async def stops_batch_mcp_agent(places: list, people: int = 1):
+    """
+    Returns {place: {'hotel': ..., 'sightseeing': ...}} for every place the agent answered,
+    places that are missing from the result should be looked up individually by the caller
+    """
+    results = {}
+    try:
+        working_cmd = await test_mcp_connection()
+        if not working_cmd:
+            log.warning("No working MCP command found, batched stops agent unavailable")
+            return results
+        
+        async with MCPTools(working_cmd) as mcptools:
+        
+            guard_toolkit(cassette.wrap_toolkit(mcptools))
+            
+            log.debug(f"MCPTools initializing for Stops Batch Agent ({len(places)} places)...")
+            agent = Agent(
+                name="Stops Batch Agent",
+                model=model_router.model("stops_batch"),
+                instructions=dedent(f"""\
+                    You are a travel agent for a group of {people} people. The route is already fixed, these are the stops: {places}.\
+                    
+                    For EVERY stop provide:\
+                    - Hotel: budget (100$ - 300$ per night), mid-range (500$-1000$ per night) and luxury (1500$+ per night) options\
+                    - Sightseeing: top 4 attractions within and close to the stop, with visit duration, entry fees (in USD) and best time to visit\
+                    
+                    Use the Google Maps API with as few tool calls as possible - combine stops in one search where you can\
+                    and never look up the same place twice.\
+                    Return one entry per stop, using the stop names exactly as given.\
+                    """
+                ),
+                tools=[mcptools],
+                response_model=StopsPlan,
+                markdown=False,
+            )
+            log.debug("Stops Batch Agent initialized!")
+            
+            try:
+                response_stream = await arun_routed(agent, f"Find hotels and sightseeing for these stops: {', '.join(places)}")
+                await show_response(response_stream)
+                
+                content = getattr(response_stream, 'content', None)
+                if isinstance(content, StopsPlan):
+                    wanted = {place.strip().lower(): place for place in places}
+                    for stop in content.stops:
+                        place = wanted.get(stop.place.strip().lower())
+                        if place and stop.hotel.strip() and stop.sightseeing.strip():
+                            results[place] = {'hotel': stop.hotel, 'sightseeing': stop.sightseeing}
+                            destination_index.add_sightseeing(place, stop.sightseeing)
+                
+            finally:
+                if hasattr(agent, 'close') and callable(agent.close):
+                    try:
+                        if asyncio.iscoroutinefunction(agent.close):
+                            await agent.close()
+                        else:
+                            agent.close()
+                        log.debug("Agent closed")
+                    except Exception as e:
+                        log.warning(f"Error closing agent: {e}")
+                    
+        log.debug("MCPTools context exited.")
+    
+    except Exception as e:
+        log.warning(f"Error occurred in stops_batch_agent: {e}")
+        
+    return results
+
+
+## fused day planner agent - transport, hotel and sightseeing for one leg in a single run
+@coalesce
+@cassette.recorded
+async def day_planner_mcp_agent(start: str, end: str, people: int = 1):
+    """
+    Returns a dict with 'transport', 'hotel' and 'sightseeing' for the leg start -> end,
+    or None if the fused run failed (callers fall back to the individual agents)
+    """
+    plan = None
+    try:
+        working_cmd = await test_mcp_connection()
+        if not working_cmd:
+            log.warning("No working MCP command found, day planner unavailable")
+            return None
+        
+        async with MCPTools(working_cmd) as mcptools:
+        
+            guard_toolkit(cassette.wrap_toolkit(mcptools))
+            
+            log.debug("MCPTools initializing for Day Planner Agent...")
+            agent = Agent(
+                name="Day Planner Agent",
+                model=model_router.model("day_planner"),
+                instructions=dedent(f"""\
+                    You are a travel agent planning one day of a trip for {people} people, travelling from {start} to {end}.\
+                    
+                    Use the Google Maps API efficiently - look up {end} once and reuse that result for every part of the plan:\
+                    - Transport: exact time and cost (in USD) from {start} to {end} by car, train (mention railway station name) and flight (mention airport name)\
+                    - Hotel: budget (100$ - 300$ per night), mid-range (500$-1000$ per night) and luxury (1500$+ per night) options near {end}\
+                    - Sightseeing: top 4-5 attractions within and close to {end}, with visit duration, entry fees (in USD) and best time to visit\
+                    
+                    You must not return any incorrect responses.\
+                    """
+                ),
+                tools=[mcptools],
+                response_model=DayPlan,
+                markdown=False,
+            )
+            log.debug("Day Planner Agent initialized!")
+            
+            try:
+                response_stream = await arun_routed(agent, f"Plan the day from {start} to {end} for {people} people.")
+                await show_response(response_stream)
+                
+                content = getattr(response_stream, 'content', None)
+                if isinstance(content, DayPlan):
+                    plan = content.model_dump()
+                    destination_index.add_sightseeing(end, plan['sightseeing'])
+                
+            finally:
+                if hasattr(agent, 'close') and callable(agent.close):
+                    try:
+                        if asyncio.iscoroutinefunction(agent.close):
+                            await agent.close()
+                        else:
+                            agent.close()
+                        log.debug("Agent closed")
+                    except Exception as e:
+                        log.warning(f"Error closing agent: {e}")
+                    
+        log.debug("MCPTools context exited.")
+    
+    except Exception as e:
+        log.warning(f"Error occurred in day_planner_agent: {e}")
         return None
+        
+    return plan
+
+
+def parse_options(response_text: str, limit: int = None, exclude: list = ()):
+    """
+    Parse a numbered / bulleted list of destinations into a clean list of names,
+    dropping the places in `exclude` (current place, places already visited)
+    """
+    options = []
+    if not response_text:
+        return options
+    excluded = {normalize_place(place) for place in exclude if place}
+    for line in response_text.strip().split('\n'):
+        name = line.strip().lstrip('0123456789.)-*• ').strip().strip('*').strip()
+        if name and name not in options and normalize_place(name) not in excluded:
+            options.append(name)
+    return options[:limit] if limit else options
+
+## location options agent (interactive mode)
+@coalesce
+@cassette.recorded
+async def location_options_mcp_agent(message: str, place: str, days_left: int, tourist_destination: str, places_visited: list, options: int = 3):
+    response_text = None
+    
+    # local index first
+    known = destination_index.next_destinations(place, tourist_destination, places_visited, allow_stale = ledger.level() != "normal")
+    if len(known) >= options:
+        log.info(f"Next destinations from {place} served from the local index")
+        return known[:options]
+    
+    try:
+        working_cmd = await test_mcp_connection()
+        if not working_cmd:
+            log.warning("No working MCP command found, using fallback agent without MCP tools")
+            return await location_options_fallback_agent(message, place, days_left, tourist_destination, places_visited, options)
+
+        async with MCPTools(working_cmd) as mcptools:
+
+            guard_toolkit(cassette.wrap_toolkit(mcptools))
+
+            log.debug("MCPTools initializing for Location Options Agent...")
+            agent = Agent(
+                name="Location Options Agent",
+                model=model_router.model("location_options"),
+                instructions=dedent(f"""\
+                    You are a travel agent. The tourists have {days_left} days left in their trip.\
+                    Starting from {place}, recommend the {options} best next tourist destinations they could visit.\
+                    Keep in mind the next place must be within {tourist_destination} and cannot repeat any places already visited: {places_visited}.\
+
+                    Consider:\
+                    - Distance from {place} (not too far for the remaining days)\
+                    - Popular tourist attractions\
+                    - Accommodation availability\
+                    - Transportation connectivity\
+
+                    Return ONLY the names of the recommended destinations, best first, one per line, nothing else.\
+                    """
+                ),
+                tools=[mcptools],
+                markdown=True,
+            )
+            log.debug("Location Options Agent initialized!")
+
+            try:
+                response_stream = await stream_agent(agent, message)
+                await show_response(response_stream)
+
+                # extracting the actual text content
+                response_text = extract_text_from_response(response_stream)
+
+            finally:
+                if hasattr(agent, 'close') and callable(agent.close):
+                    try:
+                        if asyncio.iscoroutinefunction(agent.close):
+                            await agent.close()
+                        else:
+                            agent.close()
+                        log.debug("Agent closed")
+                    except Exception as e:
+                        log.warning(f"Error closing agent: {e}")
+
+        log.debug("MCPTools context exited.")
+
+    except Exception as e:
+        log.warning(f"Error occurred in location_options_agent: {e}")
+        return await location_options_fallback_agent(message, place, days_left, tourist_destination, places_visited, options)
+
+    # feeding the local index with the live answer
+    destination_index.add_next_destinations(place, tourist_destination, parse_options(response_text, options))
+    return parse_options(response_text, options, exclude=[place, *(places_visited or [])])
+
+## fallback location options agent
+async def location_options_fallback_agent(message: str, place: str, days_left: int, tourist_destination: str, places_visited: list, options: int = 3):
+    """
+    Fallback location options agent without MCP tools
+    """
+    try:
+        agent = Agent(
+            name="Location Options Fallback Agent",
+            model=model_router.model("fallback_small"),
+            instructions=dedent(f"""\
+                You are a travel agent. The tourists have {days_left} days left in their trip.\
+                Starting from {place}, recommend the {options} best next tourist destinations they could visit.\
+                Keep in mind the next place must be within {tourist_destination} and cannot repeat any places already visited: {places_visited}.\
+
+                Consider:\
+                - Distance from {place} (not too far for the remaining days)\
+                - Popular tourist attractions\
+                - Accommodation availability\
+                - Transportation connectivity\
+
+                Return ONLY the names of the recommended destinations, best first, one per line, nothing else.\
+                """
+            ),
+            markdown=True,
+        )
+
+        response_stream = await arun_routed(agent, message, stream=False)
+        response_text = extract_text_from_response(response_stream)
+
+        if hasattr(agent, 'close') and callable(agent.close):
+            try:
+                if asyncio.iscoroutinefunction(agent.close):
+                    await agent.close()
+                else:
+                    agent.close()
+            except Exception as e:
+                log.warning(f"Error closing fallback agent: {e}")
+
+        return parse_options(response_text, options, exclude=[place, *(places_visited or [])])
+
+    except Exception as e:
+        log.warning(f"Error in fallback location options agent: {e}")
+        return []
 
 # function to demonstrate usage
 async def test_agents():
@@ -538,7 +882,9 @@ async def test_agents():
     location_result = await location_mcp_agent(
         "What's the next best place to visit from Sikkim for a 7-day trip?",
         place="Sikkim",
-        days_left=4
+        days_left=4,
+        tourist_destination="North East India",
+        places_visited=["Sikkim"],
     )
     print(f"Location Result Type: {type(location_result)}")
     print(f"Location Result: {location_result}")
@@ -1,6 +1,9 @@
 import os
 import sys
+import time
+import uuid
 import asyncio
+import argparse
 import streamlit as st
 from dotenv import load_dotenv
 
@@ -9,23 +12,62 @@ from llama_index.llms.groq import Groq
 from agno.models.openai import OpenAIChat
 from agents_arion import team_leader, transport_agent
 from agents_sahil import transport_agent, location_agent, sightseeing_agent, hotel_booking_agent
-from mcp_agents import transport_mcp_agent, hotel_booking_mcp_agent, sightseeing_mcp_agent, location_mcp_agent
+from mcp_agents import transport_mcp_agent, hotel_booking_mcp_agent, sightseeing_mcp_agent, location_mcp_agent, location_options_mcp_agent, day_planner_mcp_agent, stops_batch_mcp_agent
+from prefetch import SpeculativePrefetcher, plan_leg
+from beam import BeamSearch
+from config import CONFIG
+from router import model_router, price_of
+from ledger import ledger, trip_scope, usage_of
+from loop_runner import BackgroundLoop
+from cassette import cassette
+from trip_log import get_logger
+from loop_monitor import monitor
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 
-places_visited = list()
+log = get_logger("pipeline")
 
-async def multi_agent_collaboration(start_location: str, tourist_destination: str, end_location: str, budget: float, total_days: int, number_of_people: int):
+
+
+@st.cache_resource
+def get_background_loop():
+    """
+    One event loop per process, shared by every Streamlit rerun and session (watched by the loop monitor)
+    """
+    background = BackgroundLoop()
+    monitor.start(background.loop)
+    return background
+
+
+def format_day(day: int, start: str, end: str, day_results: dict, next_destination: str):
+    """
+    Format the information collected for a single day into the final prompt block
+    """
+    return f"""
+                    Day {day}: {start} to {end}
+                    Transport: {day_results.get('transport', 'Information not available')}
+                    Hotel: {day_results.get('hotel', 'Information not available')}
+                    Sightseeing: {day_results.get('sightseeing', 'Information not available')}
+                    Next Destination: {next_destination if next_destination != end else 'Final destination'}
+                    ---
+                    """
+
+async def multi_agent_collaboration(start_location: str, tourist_destination: str, end_location: str, budget: float, total_days: int, number_of_people: int, fused: bool = None):
     
     """
     This function coordinates the multi-agent collaboration for a travel itinerary.
     It hard codes the flow between individual agents and their respective tasks.
     We didn't want some pre-defined "team agent" to have the control, instead we wanted to have a more flexible approach.
+    With `fused` (default: CONFIG["FUSED_DAY_PLANNER"]) each day is planned by a single day planner agent run,
+    falling back to the transport / sightseeing / hotel agents if that run fails.
     """
     
+    if fused is None:
+        fused = CONFIG["FUSED_DAY_PLANNER"]
+    
     assert(total_days > 0), "Total days must be greater than 0"
     assert(budget > 0), "Budget must be greater than 0"
     assert(number_of_people > 0), "Number of people must be greater than 0"
@@ -33,6 +75,7 @@ async def multi_agent_collaboration(start_location: str, tourist_destination: st
     
     start = start_location
     end = tourist_destination
+    places_visited = list()
     
     total_prompt = ""
     day = 0
@@ -42,175 +85,440 @@ async def multi_agent_collaboration(start_location: str, tourist_destination: st
     consecutive_failures = 0
     max_consecutive_failures = 3
     
-    while(total_days > 0 and consecutive_failures < max_consecutive_failures):
+    # agent runs that keep going (closing agents / MCP sessions) after we got what we needed
+    background = []
+    
+    try:
+        while(total_days > 0 and consecutive_failures < max_consecutive_failures):
         
-        day += 1
-        day_results = {}
-        day_success = True
+            day += 1
+            day_results = {}
+            day_success = True
         
-        print(f"\n{'='*50}")
-        print(f"Processing Day {day} ({total_days} days remaining)")
-        print(f"Route: {start} -> {end}")
-        print(f"{'='*50}")
+            log.info(f"Processing Day {day} ({total_days} days remaining), route: {start} -> {end}")
         
-        ## transport agent
-        try:
-            print(f"Getting transport options from {start} to {end}...")
-            transport = await transport_mcp_agent(
-                message = f"Find me the price (convert to USD) of traveling from {start} to {end} using car, train, flight for {number_of_people} people. Please return in json format, no unnecessary text to be returned.",
-                people = number_of_people,
-            )
+            ## location agent - runs alongside the other agents, we only wait for the first line of its answer
+            first_line = None
+            if total_days > 1:  # only if we have more days left
+                log.info(f"Finding next destination from {end}...")
+                first_line = asyncio.get_running_loop().create_future()
+                background.append(asyncio.create_task(location_mcp_agent(
+                    message = f"Find me the nearest most popular tourist destination from {end} where tourists can spend the night. Consider that they have {total_days-1} days left.",
+                    place = end,
+                    days_left = total_days - 1,
+                    tourist_destination = tourist_destination,
+                    places_visited = list(places_visited),
+                    first_line = first_line,
+                )))
+        
+            ## fused day planner - one agent run for transport, hotel and sightseeing
+            if fused:
+                log.info(f"Planning the day from {start} to {end} with the fused day planner...")
+                plan = await day_planner_mcp_agent(start = start, end = end, people = number_of_people)
+                if plan and all(plan.get(key, '').strip() for key in ('transport', 'hotel', 'sightseeing')):
+                    day_results.update(plan)
+                    log.info(f"Day planner results retrieved successfully")
+                else:
+                    log.warning(f"Day planner failed, falling back to the individual agents")
+        
+            ## individual agents (default path, and fallback for the fused planner)
+            if not day_results:
+                ## transport agent
+                try:
+                    log.info(f"Getting transport options from {start} to {end}...")
+                    transport = await transport_mcp_agent(
+                        message = f"Find me the price (convert to USD) of traveling from {start} to {end} using car, train, flight for {number_of_people} people. Please return in json format, no unnecessary text to be returned.",
+                        people = number_of_people,
+                    )
             
-            if transport and transport.strip():
-                day_results['transport'] = transport
-                print(f"Transport options retrieved successfully")
-            else:
-                day_results['transport'] = f"Transport information not available for {start} to {end}"
-                print(f"Transport agent returned empty result")
-                day_success = False
+                    if transport and transport.strip():
+                        day_results['transport'] = transport
+                        log.info(f"Transport options retrieved successfully")
+                    else:
+                        day_results['transport'] = f"Transport information not available for {start} to {end}"
+                        log.warning(f"Transport agent returned empty result")
+                        day_success = False
                 
-        except Exception as e:
-            print(f"Transport agent failed: {e}")
-            day_results['transport'] = f"Error getting transport options from {start} to {end}: {str(e)}"
-            day_success = False
+                except Exception as e:
+                    log.warning(f"Transport agent failed: {e}")
+                    day_results['transport'] = f"Error getting transport options from {start} to {end}: {str(e)}"
+                    day_success = False
         
-        ## sightseeing agent
-        try:
-            print(f"Getting sightseeing options for {end}...")
-            sightseeing = await sightseeing_mcp_agent(
-                message = f"Find me the 4 best sightseeing options for the location {end} for {number_of_people} people. Be very specific and give me the best options.",
-                place = end,
-                people = number_of_people,
-            )
+                ## sightseeing agent
+                try:
+                    log.info(f"Getting sightseeing options for {end}...")
+                    sightseeing = await sightseeing_mcp_agent(
+                        message = f"Find me the 4 best sightseeing options for the location {end} for {number_of_people} people. Be very specific and give me the best options.",
+                        place = end,
+                        people = number_of_people,
+                    )
             
-            if sightseeing and sightseeing.strip():
-                day_results['sightseeing'] = sightseeing
-                print(f"Sightseeing options retrieved successfully")
-            else:
-                day_results['sightseeing'] = f"Sightseeing information not available for {end}"
-                print(f"Sightseeing agent returned empty result")
-                day_success = False
+                    if sightseeing and sightseeing.strip():
+                        day_results['sightseeing'] = sightseeing
+                        log.info(f"Sightseeing options retrieved successfully")
+                    else:
+                        day_results['sightseeing'] = f"Sightseeing information not available for {end}"
+                        log.warning(f"Sightseeing agent returned empty result")
+                        day_success = False
                 
-        except Exception as e:
-            print(f"Sightseeing agent failed: {e}")
-            day_results['sightseeing'] = f"Error getting sightseeing options for {end}: {str(e)}"
-            day_success = False
+                except Exception as e:
+                    log.warning(f"Sightseeing agent failed: {e}")
+                    day_results['sightseeing'] = f"Error getting sightseeing options for {end}: {str(e)}"
+                    day_success = False
         
-        ## hotel booking agent
-        try:
-            print(f"Getting hotel options for {end}...")
-            hotel = await hotel_booking_mcp_agent(
-                message = f"Find me the best hotel in {end} for {number_of_people} people. Be very specific and give me the best options with prices (convert to USD).",
-                place = end,
-                people = number_of_people,
-            )
+                ## hotel booking agent
+                try:
+                    log.info(f"Getting hotel options for {end}...")
+                    hotel = await hotel_booking_mcp_agent(
+                        message = f"Find me the best hotel in {end} for {number_of_people} people. Be very specific and give me the best options with prices (convert to USD).",
+                        place = end,
+                        people = number_of_people,
+                    )
             
-            if hotel and hotel.strip():
-                day_results['hotel'] = hotel
-                print(f"Hotel options retrieved successfully")
-            else:
-                day_results['hotel'] = f"Hotel information not available for {end}"
-                print(f"Hotel booking agent returned empty result")
-                day_success = False
+                    if hotel and hotel.strip():
+                        day_results['hotel'] = hotel
+                        log.info(f"Hotel options retrieved successfully")
+                    else:
+                        day_results['hotel'] = f"Hotel information not available for {end}"
+                        log.warning(f"Hotel booking agent returned empty result")
+                        day_success = False
                 
-        except Exception as e:
-            print(f"Hotel booking agent failed: {e}")
-            day_results['hotel'] = f"Error getting hotel options for {end}: {str(e)}"
-            day_success = False
+                except Exception as e:
+                    log.warning(f"Hotel booking agent failed: {e}")
+                    day_results['hotel'] = f"Error getting hotel options for {end}: {str(e)}"
+                    day_success = False
         
-        ## updating start and end locations (only if we have days left)
-        next_destination = None
-        if total_days > 1:  # only if we have more days left
-            try:
-                print(f"Finding next destination from {end}...")
-                next_destination = await location_mcp_agent(
-                    message = f"Find me the nearest most popular tourist destination from {end} where tourists can spend the night. Consider that they have {total_days-1} days left.",
-                    place = end,
-                    days_left = total_days - 1,
-                    tourist_destination = tourist_destination,
-                    places_visited = places_visited,
-                )
+            ## updating start and end locations (only if we have days left)
+            next_destination = None
+            if total_days > 1:  # only if we have more days left
+                try:
+                    # resolved as soon as the destination name has been streamed
+                    next_destination = await first_line
                 
-                places_visited.append(next_destination)
-                
-                if next_destination and next_destination.strip():
-                    # stripping the response
-                    next_destination = next_destination.strip().split('\n')[0].strip()
-                    print(f"Next destination: {next_destination}")
-                else:
+                    if next_destination and next_destination.strip():
+                        places_visited.append(next_destination)
+                        log.info(f"Next destination: {next_destination}")
+                    else:
+                        next_destination = end_location  # default to end location
+                        log.warning(f"Location agent returned empty result, using end location as fallback")
+                        day_success = False
+                    
+                except Exception as e:
+                    log.warning(f"Location agent failed: {e}")
                     next_destination = end_location  # default to end location
-                    print(f"Location agent returned empty result, using end location as fallback")
                     day_success = False
-                    
-            except Exception as e:
-                print(f"Location agent failed: {e}")
-                next_destination = end_location  # default to end location
-                day_success = False
-        else:
-            next_destination = end_location
-            print(f"Last day - setting destination to final location: {end_location}")
+            else:
+                next_destination = end_location
+                log.info(f"Last day - setting destination to final location: {end_location}")
         
-        ## appending everything to the final prompt
-        day_info = f"""
-                    Day {day}: {start} to {end}
-                    Transport: {day_results.get('transport', 'Information not available')}
-                    Hotel: {day_results.get('hotel', 'Information not available')}
-                    Sightseeing: {day_results.get('sightseeing', 'Information not available')}
-                    Next Destination: {next_destination if next_destination != end else 'Final destination'}
-                    ---
-                    """
+            ## appending everything to the final prompt
+            day_info = format_day(day, start, end, day_results, next_destination)
         
-        # st.markdown(day_info)
-        total_prompt += day_info
+            # st.markdown(day_info)
+            total_prompt += day_info
         
-        # failure counter
-        if day_success:
-            consecutive_failures = 0
-        else:
-            consecutive_failures += 1
-            print(f"Day {day} had issues. Consecutive failures: {consecutive_failures}")
+            # failure counter
+            if day_success:
+                consecutive_failures = 0
+            else:
+                consecutive_failures += 1
+                log.warning(f"Day {day} had issues. Consecutive failures: {consecutive_failures}")
         
-        # updating locations for next iteration
-        start = end
-        end = next_destination
+            # updating locations for next iteration
+            start = end
+            end = next_destination
         
-        total_days -= 1
+            total_days -= 1
         
-        print(f"Day {day} completed. Days remaining: {total_days}")
+            log.info(f"Day {day} completed. Days remaining: {total_days}")
         
-        await asyncio.sleep(1)
+            await asyncio.sleep(1)
+    
+        await asyncio.gather(*background, return_exceptions=True)
+    finally:
+        # the trip was cancelled / failed: its location agents must not keep streaming the model
+        for task in background:
+            if not task.done():
+                task.cancel()
     
     if consecutive_failures >= max_consecutive_failures:
         error_msg = f"\nNOTICE: Trip planning encountered repeated issues after Day {day}. Some information may be incomplete or based on fallback responses.\n"
         total_prompt = error_msg + total_prompt
     
-    print(f"\nTrip planning completed! Generated itinerary for {original_total_days} days.")
+    log.info(f"Trip planning completed! Generated itinerary for {original_total_days} days.")
+    return total_prompt
+
+
+async def plan_route(tourist_destination: str, end_location: str, total_days: int):
+    """
+    Fix the sequence of overnight stops up front (one per day), using only the location agent
+    """
+    stops = [tourist_destination]
+    while len(stops) < total_days:
+        days_left = total_days - len(stops)
+        place = stops[-1]
+        try:
+            log.info(f"Finding next destination from {place}...")
+            next_destination = await location_mcp_agent(
+                message = f"Find me the nearest most popular tourist destination from {place} where tourists can spend the night. Consider that they have {days_left} days left.",
+                place = place,
+                days_left = days_left,
+                tourist_destination = tourist_destination,
+                places_visited = stops[1:],
+            )
+        except Exception as e:
+            log.warning(f"Location agent failed: {e}")
+            next_destination = None
+        
+        if not next_destination or not next_destination.strip():
+            log.warning(f"Location agent returned empty result, using end location as fallback")
+            next_destination = end_location
+        stops.append(next_destination.strip().split('\n')[0].strip())
+    return stops
+
+
+async def batched_collaboration(start_location: str, tourist_destination: str, end_location: str, budget: float, total_days: int, number_of_people: int):
+    
+    """
+    Route-first version of multi_agent_collaboration.
+    The whole route is fixed first, then hotels and sightseeing for all stops are fetched in a few batched
+    agent calls (BATCH_MAX_STOPS stops per call) while the transport legs are fetched concurrently.
+    Stops the batch could not answer are looked up individually.
+    """
+    
+    assert(total_days > 0), "Total days must be greater than 0"
+    assert(budget > 0), "Budget must be greater than 0"
+    assert(number_of_people > 0), "Number of people must be greater than 0"
+    assert(start_location != tourist_destination), "Start location and tourist destination must be different"
+    
+    total_days = int(total_days)
+    stops = await plan_route(tourist_destination, end_location, total_days)
+    legs = list(zip([start_location] + stops[:-1], stops))
+    log.info(f"Route: {' -> '.join([start_location] + stops)}")
+    
+    ## batch stage - hotels and sightseeing for every stop, transport for every leg
+    unique_stops = list(dict.fromkeys(stops))
+    chunk = max(1, CONFIG["BATCH_MAX_STOPS"])
+    batches = [unique_stops[i:i + chunk] for i in range(0, len(unique_stops), chunk)]
+    
+    transports, *batch_results = await asyncio.gather(
+        asyncio.gather(*[
+            transport_mcp_agent(
+                message = f"Find me the price (convert to USD) of traveling from {start} to {end} using car, train, flight for {number_of_people} people. Please return in json format, no unnecessary text to be returned.",
+                people = number_of_people,
+            )
+            for start, end in legs
+        ], return_exceptions = True),
+        *[stops_batch_mcp_agent(places = batch, people = number_of_people) for batch in batches],
+        return_exceptions = True,
+    )
+    
+    stop_results = {}
+    for result in batch_results:
+        if isinstance(result, dict):
+            stop_results.update(result)
+    
+    ## stops the batch missed are looked up one by one
+    missing = [place for place in unique_stops if place not in stop_results]
+    if missing:
+        log.warning(f"Batch missed {missing}, looking them up individually")
+        lookups = await asyncio.gather(*[
+            asyncio.gather(
+                sightseeing_mcp_agent(
+                    message = f"Find me the 4 best sightseeing options for the location {place} for {number_of_people} people. Be very specific and give me the best options.",
+                    place = place,
+                    people = number_of_people,
+                ),
+                hotel_booking_mcp_agent(
+                    message = f"Find me the best hotel in {place} for {number_of_people} people. Be very specific and give me the best options with prices (convert to USD).",
+                    place = place,
+                    people = number_of_people,
+                ),
+                return_exceptions = True,
+            )
+            for place in missing
+        ])
+        for place, (sightseeing, hotel) in zip(missing, lookups):
+            stop_results[place] = {
+                'sightseeing': sightseeing if isinstance(sightseeing, str) and sightseeing.strip() else f"Sightseeing information not available for {place}",
+                'hotel': hotel if isinstance(hotel, str) and hotel.strip() else f"Hotel information not available for {place}",
+            }
+    
+    ## writing the results into the per-day slots
+    total_prompt = ""
+    for day, ((start, end), transport) in enumerate(zip(legs, transports), 1):
+        day_results = dict(stop_results[end])
+        if isinstance(transport, str) and transport.strip():
+            day_results['transport'] = transport
+        else:
+            day_results['transport'] = f"Transport information not available for {start} to {end}"
+        next_destination = stops[day] if day < total_days else end_location
+        total_prompt += format_day(day, start, end, day_results, next_destination)
+    
+    log.info(f"Trip planning completed! Generated itinerary for {total_days} days.")
+    return total_prompt
+
+
+async def console_choose(options: list):
+    """
+    Ask the user (on the console) to pick one of the candidate destinations
+    """
+    print("\nCandidate next destinations:")
+    for i, option in enumerate(options, 1):
+        print(f"  {i}. {option}")
+    while True:
+        answer = (await asyncio.to_thread(input, "Select a destination: ")).strip()
+        if answer.isdigit() and 1 <= int(answer) <= len(options):
+            return options[int(answer) - 1]
+        if answer:
+            return answer
+
+
+async def interactive_collaboration(start_location: str, tourist_destination: str, end_location: str, budget: float, total_days: int, number_of_people: int, choose = console_choose):
+    
+    """
+    Interactive version of multi_agent_collaboration - the user picks the next destination at every phase.
+    While the user is looking at the options, the legs for the top candidates are prefetched speculatively,
+    so the chosen branch is usually ready (or nearly ready) by the time the user decides.
+    """
+    
+    assert(total_days > 0), "Total days must be greater than 0"
+    assert(budget > 0), "Budget must be greater than 0"
+    assert(number_of_people > 0), "Number of people must be greater than 0"
+    assert(start_location != tourist_destination), "Start location and tourist destination must be different"
+    
+    prefetcher = SpeculativePrefetcher()
+    visited = [tourist_destination]
+    start = start_location
+    end = tourist_destination
+    total_prompt = ""
+    
+    try:
+        day_results = await plan_leg(start, end, number_of_people)
+        
+        for day in range(1, total_days + 1):
+            days_left = total_days - day
+            
+            if days_left > 0:
+                options = await location_options_mcp_agent(
+                    message = f"Find me the nearest most popular tourist destinations from {end} where tourists can spend the night. Consider that they have {days_left} days left.",
+                    place = end,
+                    days_left = days_left,
+                    tourist_destination = tourist_destination,
+                    places_visited = visited,
+                    options = CONFIG["LOCATION_OPTIONS"],
+                )
+                if not options:
+                    options = [end_location]
+                
+                # the user's think time is used to plan the likely next legs
+                prefetcher.start(end, options, number_of_people)
+                next_destination = await choose(options)
+            else:
+                next_destination = end_location
+            
+            total_prompt += format_day(day, start, end, day_results, next_destination)
+            
+            if days_left > 0:
+                visited.append(next_destination)
+                day_results = await prefetcher.select(next_destination, end, number_of_people)
+                start, end = end, next_destination
+    finally:
+        prefetcher.cancel_all()
+    
+    log.info(f"Trip planning completed! Generated itinerary for {total_days} days.")
+    return total_prompt
+
+
+async def beam_collaboration(start_location: str, tourist_destination: str, end_location: str, budget: float, total_days: int, number_of_people: int):
+    
+    """
+    Beam search version of multi_agent_collaboration.
+    Instead of committing to one next destination per day, the BEAM_WIDTH best partial itineraries are kept,
+    their next legs are planned and priced concurrently, and the cheapest complete plan within the budget wins.
+    """
+    
+    assert(total_days > 0), "Total days must be greater than 0"
+    assert(budget > 0), "Budget must be greater than 0"
+    assert(number_of_people > 0), "Number of people must be greater than 0"
+    assert(start_location != tourist_destination), "Start location and tourist destination must be different"
+    
+    total_days = int(total_days)
+    plan = await BeamSearch().search(start_location, tourist_destination, end_location, budget, total_days, number_of_people)
+    stops = plan["stops"]
+    log.info(f"Route: {' -> '.join([start_location] + stops)} (estimated ${plan['cost']:.0f})")
+    
+    total_prompt = ""
+    for day, (start, end, day_results) in enumerate(zip([start_location] + stops[:-1], stops, plan["legs"]), 1):
+        next_destination = stops[day] if day < len(stops) else end_location
+        total_prompt += format_day(day, start, end, day_results, next_destination)
+    
+    log.info(f"Trip planning completed! Generated itinerary for {total_days} days.")
     return total_prompt
 
 
 # Async wrapper for Streamlit
-def run_multi_agent_collaboration(start_location, tourist_destination, end_location, budget, total_days, number_of_people):
+PLANNING_MODES = {
+    "Day by day": "daily",
+    "Route first (batched)": "batched",
+    "Beam search": "beam",
+}
+
+
+async def in_trip(trip_id: str, coro):
+    """
+    Await a coroutine with every model call inside it charged to trip_id (a new trip if None)
+    """
+    with trip_scope(trip_id):
+        return await coro
+
+
+def run_multi_agent_collaboration(start_location, tourist_destination, end_location, budget, total_days, number_of_people, fused = None, mode = "daily", trip_id = None):
     """
     Wrapper function to run the async multi_agent_collaboration in a sync context
     """
     try:
-        # Get or create event loop
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+        if mode == "batched":
+            coro = batched_collaboration(start_location, tourist_destination, end_location, budget, total_days, number_of_people)
+        elif mode == "beam":
+            coro = beam_collaboration(start_location, tourist_destination, end_location, budget, total_days, number_of_people)
+        else:
+            coro = multi_agent_collaboration(start_location, tourist_destination, end_location, budget, total_days, number_of_people, fused)
         
-        # Run the async function
-        return loop.run_until_complete(
-            multi_agent_collaboration(start_location, tourist_destination, end_location, budget, total_days, number_of_people)
-        )
+        # the coroutine runs on the shared background loop, we just wait for its result
+        # (run() cancels it if this script run is stopped while waiting, so an abandoned trip stops spending)
+        return get_background_loop().run(in_trip(trip_id, coro))
     except Exception as e:
         return f"Error in trip planning: {str(e)}\n\nPlease check your API keys and internet connection."
 
 
+def interactive_main(argv: list = None):
+    """
+    Console entry point for interactive mode:
+    python pipeline.py interactive --start Kolkata --destination Sikkim --end Kolkata --days 3 --people 2 --budget 1000
+    """
+    parser = argparse.ArgumentParser(prog="pipeline.py interactive", description="Plan a trip choosing the next destination at every phase")
+    parser.add_argument("--start", required=True, help="start location")
+    parser.add_argument("--destination", required=True, help="tourist destination")
+    parser.add_argument("--end", help="end location (defaults to the start location)")
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--people", type=int, default=1)
+    parser.add_argument("--budget", type=float, default=1000.0, help="budget in USD")
+    args = parser.parse_args(argv)
+    
+    itinerary = asyncio.run(in_trip(None, interactive_collaboration(
+        args.start, args.destination, args.end or args.start, args.budget, args.days, args.people
+    )))
+    print(itinerary)
+    return 0
+
+
 if __name__ == "__main__":
     
+    # console interactive mode, `streamlit run pipeline.py` passes no arguments
+    if sys.argv[1:2] == ["interactive"]:
+        sys.exit(interactive_main(sys.argv[2:]))
+    
     st.set_page_config(layout='wide', page_title="Around the World with Agents")
     st.title("Around the World with Agents")
     st.write("This is a collaborative multi-agent application for travel itinerary planning.")
@@ -232,10 +540,13 @@ if __name__ == "__main__":
         budget = st.number_input("Budget (in USD)")
         total_days = st.number_input("Total Days")
         number_of_people = st.number_input("Number of People")
+        mode = PLANNING_MODES[st.selectbox("Planning Mode", list(PLANNING_MODES))]
+        fused = st.checkbox("Fused day planner (fewer agent calls)", value=CONFIG["FUSED_DAY_PLANNER"])
         if not start_location or not tourist_destination or not end_location or not budget or not total_days or not number_of_people:
             st.error("Please fill in all location fields.")
     
     if st.button("Generate Itinerary"):
+        trip_id = uuid.uuid4().hex[:8]
         with st.spinner(f"Collecting all information... Might take a few minutes..."):
             total_prompt = run_multi_agent_collaboration(
                 start_location,
@@ -243,14 +554,19 @@ if __name__ == "__main__":
                 end_location,
                 budget,
                 total_days,
-                number_of_people
+                number_of_people,
+                fused,
+                mode,
+                trip_id
             )
         
         if total_prompt:
             st.subheader("Generated Itinerary")
+            collected = total_prompt
             
             with st.spinner("Generating the final itinerary..."):
-                llm = Groq(model="llama-3.3-70b-versatile", api_key=GROQ_API_KEY)
+                compile_provider, compile_model = model_router.pick("compile")
+                llm = Groq(model=compile_model, api_key=GROQ_API_KEY)
                 total_prompt = f"""
                 You are an travel itinerary planner.
                 You have been given the following information:
@@ -283,9 +599,32 @@ if __name__ == "__main__":
                 Please generate a detailed travel itinerary based on the following information:
                 
                 """ + total_prompt
-                response = llm.complete(total_prompt)
+
+                with trip_scope(trip_id):
+                    if ledger.level() == "exhausted":
+                        # over the spend cap - show what the agents collected instead of compiling it
+                        response = "**Spend cap reached, showing the collected information without the final compile.**\n\n" + collected
+                    else:
+                        compile_started = time.perf_counter()
+                        try:
+                            response = cassette.call("compile", {"prompt": total_prompt}, lambda: llm.complete(total_prompt))
+                        except Exception:
+                            model_router.record(compile_provider, compile_model, time.perf_counter() - compile_started, ok=False)
+                            raise
+                        model_router.record(compile_provider, compile_model, time.perf_counter() - compile_started, ok=True)
+                        input_tokens, output_tokens = usage_of(response)
+                        ledger.charge("Compile", compile_provider, compile_model, input_tokens, output_tokens,
+                                      price_of(compile_provider, compile_model, input_tokens, output_tokens))
             
             st.markdown(response)
             st.success("Enjoy your trip!")
+            
+            with st.expander("Cost breakdown"):
+                st.json(ledger.breakdown(trip_id))
+            
+            stalls = monitor.stalls_for(trip_id)
+            if stalls:
+                with st.expander(f"Event loop stalls ({len(stalls)})"):
+                    st.json(stalls)
         else:
             st.error("Failed to generate itinerary. Please check your API keys and internet connection.")
\ No newline at end of file
@@ -0,0 +1,98 @@
+import asyncio
+
+from config import CONFIG
+from mcp_agents import transport_mcp_agent, hotel_booking_mcp_agent, sightseeing_mcp_agent
+from trip_log import get_logger
+
+log = get_logger("prefetch")
+
+
+async def plan_leg(start: str, end: str, people: int):
+    """
+    Fetch transport, sightseeing and hotel information for a single leg (start -> end).
+    The three agents are independent of each other, so they are run side by side.
+    """
+    transport, sightseeing, hotel = await asyncio.gather(
+        transport_mcp_agent(
+            message = f"Find me the price (convert to USD) of traveling from {start} to {end} using car, train, flight for {people} people. Please return in json format, no unnecessary text to be returned.",
+            people = people,
+        ),
+        sightseeing_mcp_agent(
+            message = f"Find me the 4 best sightseeing options for the location {end} for {people} people. Be very specific and give me the best options.",
+            place = end,
+            people = people,
+        ),
+        hotel_booking_mcp_agent(
+            message = f"Find me the best hotel in {end} for {people} people. Be very specific and give me the best options with prices (convert to USD).",
+            place = end,
+            people = people,
+        ),
+        return_exceptions = True,
+    )
+
+    leg = {}
+    for key, value, fallback in (
+        ('transport', transport, f"Transport information not available for {start} to {end}"),
+        ('sightseeing', sightseeing, f"Sightseeing information not available for {end}"),
+        ('hotel', hotel, f"Hotel information not available for {end}"),
+    ):
+        if isinstance(value, BaseException) or not value or not value.strip():
+            leg[key] = fallback
+        else:
+            leg[key] = value
+    return leg
+
+
+class SpeculativePrefetcher:
+    """
+    Starts the leg planning for the most likely next destinations while the user is still choosing.
+    The branch the user picks is promoted, every other branch is cancelled.
+    """
+
+    def __init__(self, top_k: int = None, timeout: float = None):
+        self.top_k = CONFIG["PREFETCH_TOP_K"] if top_k is None else top_k
+        self.timeout = CONFIG["PREFETCH_TIMEOUT"] if timeout is None else timeout
+        self.branches = {}
+
+    def start(self, start: str, candidates: list, people: int):
+        """
+        Kick off speculative branches for the top-k candidates (candidates are ordered best first)
+        """
+        self.cancel_all()
+        for candidate in dict.fromkeys(candidates[:self.top_k]):
+            log.info(f"Prefetching leg {start} -> {candidate}")
+            self.branches[candidate] = asyncio.create_task(
+                asyncio.wait_for(plan_leg(start, candidate, people), self.timeout),
+                name = f"prefetch:{candidate}",
+            )
+
+    async def select(self, choice: str, start: str, people: int):
+        """
+        Promote the branch for the chosen destination and cancel the rest.
+        Falls back to a fresh (non-speculative) run if the choice was not prefetched or the branch failed.
+        """
+        task = self.branches.pop(choice, None)
+        self.cancel_all()
+
+        if task is not None:
+            try:
+                leg = await task
+                log.info(f"Prefetch hit for {choice}")
+                return leg
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning(f"Prefetched branch for {choice} failed: {e}")
+
+        log.info(f"Prefetch miss for {choice}")
+        return await plan_leg(start, choice, people)
+
+    def cancel_all(self):
+        """
+        Cancel every outstanding speculative branch
+        """
+        for candidate, task in self.branches.items():
+            if not task.done():
+                task.cancel()
+                log.info(f"Cancelled prefetch for {candidate}")
+        self.branches.clear()
@@ -0,0 +1,216 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+
+from config import CONFIG
+from cassette import cassette
+from ledger import ledger, usage_of
+
+load_dotenv()
+
+# USD per 1M tokens (input, output)
+PRICES = {
+    ("openai", "gpt-4o-mini"): (0.15, 0.60),
+    ("openai", "gpt-4o"): (2.50, 10.00),
+    ("groq", "llama-3.3-70b-versatile"): (0.59, 0.79),
+    ("groq", "llama-3.1-8b-instant"): (0.05, 0.08),
+}
+
+# rough latency priors (seconds) used until a model has been observed
+LATENCY_PRIORS = {
+    ("openai", "gpt-4o-mini"): 6.0,
+    ("openai", "gpt-4o"): 9.0,
+    ("groq", "llama-3.3-70b-versatile"): 4.0,
+    ("groq", "llama-3.1-8b-instant"): 1.5,
+}
+
+# candidate models per agent role, in order of preference when scores tie
+# trivial roles (a single place name / a short list) can go to the small models
+ROLES = {
+    "transport": [("openai", "gpt-4o-mini"), ("groq", "llama-3.3-70b-versatile")],
+    "hotel": [("openai", "gpt-4o-mini"), ("groq", "llama-3.3-70b-versatile")],
+    "sightseeing": [("openai", "gpt-4o-mini"), ("groq", "llama-3.3-70b-versatile")],
+    "day_planner": [("openai", "gpt-4o-mini"), ("groq", "llama-3.3-70b-versatile")],
+    "stops_batch": [("openai", "gpt-4o-mini"), ("groq", "llama-3.3-70b-versatile")],
+    "location": [("groq", "llama-3.1-8b-instant"), ("openai", "gpt-4o-mini"), ("groq", "llama-3.3-70b-versatile")],
+    "location_options": [("groq", "llama-3.1-8b-instant"), ("openai", "gpt-4o-mini"), ("groq", "llama-3.3-70b-versatile")],
+    "fallback": [("groq", "llama-3.3-70b-versatile"), ("openai", "gpt-4o-mini")],
+    "fallback_small": [("groq", "llama-3.1-8b-instant"), ("groq", "llama-3.3-70b-versatile"), ("openai", "gpt-4o-mini")],
+    "team": [("openai", "gpt-4o-mini"), ("groq", "llama-3.3-70b-versatile")],
+    "team_member": [("openai", "gpt-4o-mini"), ("groq", "llama-3.3-70b-versatile")],
+    # agents_arion's team runs on Groq first
+    "arion_team": [("groq", "llama-3.3-70b-versatile"), ("openai", "gpt-4o-mini")],
+    "arion_member": [("groq", "llama-3.3-70b-versatile"), ("openai", "gpt-4o-mini")],
+    # the final compile goes through llama-index Groq
+    "compile": [("groq", "llama-3.3-70b-versatile")],
+}
+
+API_KEYS = {
+    "openai": "OPENAI_API_KEY",
+    "groq": "GROQ_API_KEY",
+}
+
+
+def price_of(provider: str, model_id: str, input_tokens: int, output_tokens: int):
+    """
+    Cost in USD of a call, 0 if the model is not in the price table
+    """
+    price_in, price_out = PRICES.get((provider, model_id), (0.0, 0.0))
+    return (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+
+class ModelStats:
+    """
+    EWMA latency and error rate for a single (provider, model).
+    Both decay towards the prior with a half-life of `half_life` seconds, so a model that was shed (and is
+    therefore not called) becomes eligible again, and a single slow sample does not stick forever.
+    """
+
+    def __init__(self, latency: float, alpha: float, half_life: float):
+        self.alpha = alpha
+        self.half_life = half_life
+        self.prior = latency
+        self.latency = latency
+        self.error_rate = 0.0
+        self.calls = 0
+        self.updated = time.monotonic()
+
+    def decay(self):
+        now = time.monotonic()
+        if self.half_life > 0:
+            factor = 0.5 ** ((now - self.updated) / self.half_life)
+            self.latency = self.prior + (self.latency - self.prior) * factor
+            self.error_rate *= factor
+        self.updated = now
+
+    def update(self, latency: float, ok: bool):
+        self.decay()
+        self.calls += 1
+        if ok:
+            self.latency = self.alpha * latency + (1 - self.alpha) * self.latency
+        self.error_rate = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * self.error_rate
+
+
+class ModelRouter:
+    """
+    Picks the model for each agent role based on EWMA latency, error rate and cost.
+    Providers that keep failing are shed until their error rate decays again (ROUTER_DECAY_HALF_LIFE).
+    The first candidate of a role is its primary model, the others have to score at least
+    ROUTER_PREFERENCE_MARGIN better (per place in the list) to take over.
+    """
+
+    def __init__(self, alpha: float = None, cost_weight: float = None, shed_error_rate: float = None,
+                 half_life: float = None, preference_margin: float = None):
+        self.alpha = CONFIG["ROUTER_EWMA_ALPHA"] if alpha is None else alpha
+        self.cost_weight = CONFIG["ROUTER_COST_WEIGHT"] if cost_weight is None else cost_weight
+        self.shed_error_rate = CONFIG["ROUTER_SHED_ERROR_RATE"] if shed_error_rate is None else shed_error_rate
+        self.half_life = CONFIG["ROUTER_DECAY_HALF_LIFE"] if half_life is None else half_life
+        self.preference_margin = CONFIG["ROUTER_PREFERENCE_MARGIN"] if preference_margin is None else preference_margin
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def _stats(self, key):
+        if key not in self.stats:
+            self.stats[key] = ModelStats(LATENCY_PRIORS.get(key, 5.0), self.alpha, self.half_life)
+        stats = self.stats[key]
+        stats.decay()
+        return stats
+
+    def score(self, key):
+        """
+        Lower is better - expected latency inflated by errors, plus weighted cost of a typical call
+        """
+        stats = self._stats(key)
+        # a typical agent call is ~2k input / 500 output tokens; cost_weight converts USD to seconds
+        cost = price_of(key[0], key[1], 2000, 500) * 1000
+        return stats.latency * (1 + 4 * stats.error_rate) + self.cost_weight * cost
+
+    def candidates(self, role: str, exclude: tuple = ()):
+        """
+        Candidate models for a role, restricted to providers with an API key
+        """
+        return [
+            key for key in ROLES.get(role, ROLES["fallback"])
+            if key[0] not in exclude and os.getenv(API_KEYS[key[0]])
+        ]
+
+    def pick(self, role: str, exclude: tuple = ()):
+        """
+        Return the (provider, model_id) to use for a role
+        """
+        candidates = self.candidates(role, exclude) or ROLES.get(role, ROLES["fallback"])[:1]
+        # close to the spend cap - cheapest model wins regardless of latency
+        if ledger.level() != "normal":
+            return min(candidates, key=lambda key: price_of(key[0], key[1], 2000, 500))
+        with self.lock:
+            healthy = [key for key in candidates if self._stats(key).error_rate < self.shed_error_rate]
+            return min(healthy or candidates, key=lambda key: self.score(key) * (1 + self.preference_margin * candidates.index(key)))
+
+    def model(self, role: str, exclude: tuple = ()):
+        """
+        Build an agno model for a role
+        """
+        provider, model_id = self.pick(role, exclude)
+        if provider == "groq":
+            from agno.models.groq import Groq
+            return Groq(id=model_id, api_key=os.getenv("GROQ_API_KEY"))
+        from agno.models.openai import OpenAIChat
+        return OpenAIChat(id=model_id, api_key=os.getenv("OPENAI_API_KEY"))
+
+    def record(self, provider: str, model_id: str, latency: float, ok: bool):
+        """
+        Feed back the outcome of a call
+        """
+        with self.lock:
+            self._stats((provider.lower(), model_id)).update(latency, ok)
+
+    def report(self):
+        """
+        Current stats per model, useful for debugging routing decisions
+        """
+        with self.lock:
+            return {
+                f"{provider}/{model_id}": {"latency": round(s.latency, 2), "error_rate": round(s.error_rate, 3), "calls": s.calls}
+                for (provider, model_id), s in self.stats.items()
+            }
+
+
+model_router = ModelRouter()
+
+
+def model_key(model):
+    """
+    (provider, model_id) of an agno model
+    """
+    return (str(getattr(model, "provider", "") or "").lower(), getattr(model, "id", None))
+
+
+def charge(agent, response):
+    """
+    Charge the token usage of a run to the current trip
+    """
+    provider, model_id = model_key(agent.model)
+    input_tokens, output_tokens = usage_of(response)
+    ledger.charge(
+        getattr(agent, "name", None), provider, model_id, input_tokens, output_tokens,
+        price_of(provider, model_id, input_tokens, output_tokens),
+    )
+
+
+async def arun_routed(agent, message, **kwargs):
+    """
+    agent.arun() that reports latency and errors of the agent's model back to the router
+    and charges the run to the current trip (raises BudgetExceeded once the trip is over its cap)
+    """
+    ledger.check()
+    provider, model_id = model_key(agent.model)
+    started = time.perf_counter()
+    try:
+        response = await cassette.agent_run(agent, message, lambda: agent.arun(message, **kwargs))
+    except Exception:
+        model_router.record(provider, model_id, time.perf_counter() - started, ok=False)
+        raise
+    model_router.record(provider, model_id, time.perf_counter() - started, ok=True)
+    charge(agent, response)
+    return response
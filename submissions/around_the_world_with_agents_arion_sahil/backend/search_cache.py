@@ -0,0 +1,145 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from agno.tools.duckduckgo import DuckDuckGoTools
+
+from config import CONFIG
+
+# per-plan results (query key -> result), set with plan_scope()
+current_plan = contextvars.ContextVar("current_plan", default=None)
+
+
+def normalize_query(query: str):
+    """
+    Normalized key for a search query - only case, punctuation and whitespace are ignored.
+    Word order and words like "from" / "to" are kept, they carry the direction of a route
+    ("train from Delhi to Agra" and "train from Agra to Delhi" are different searches)
+    """
+    return " ".join(re.findall(r"[\w$]+", query.lower()))
+
+
+class SearchCache:
+    """
+    TTL-bounded on-disk cache of search results (sqlite, safe to share between threads)
+    """
+
+    def __init__(self, path: str = None, ttl: float = None):
+        self.path = CONFIG["SEARCH_CACHE_PATH"] if path is None else path
+        self.ttl = CONFIG["SEARCH_CACHE_TTL"] if ttl is None else ttl
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db = None
+
+    def _connect(self):
+        if self.db is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+        return self.db
+
+    def get(self, key: str):
+        with self.lock:
+            row = self._connect().execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+        if row and time.time() - row[1] < self.ttl:
+            return row[0]
+        return None
+
+    def set(self, key: str, value: str):
+        with self.lock:
+            db = self._connect()
+            db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (key, value, time.time()))
+            db.commit()
+
+    def purge(self):
+        """
+        Drop expired entries
+        """
+        with self.lock:
+            db = self._connect()
+            db.execute("DELETE FROM results WHERE created < ?", (time.time() - self.ttl,))
+            db.commit()
+
+    def cached(self, key: str, search):
+        """
+        Return the result for a key from the plan scope, then the disk cache, and only then call search()
+        """
+        plan = current_plan.get()
+        if plan is not None and key in plan:
+            self.hits += 1
+            return plan[key]
+
+        value = self.get(key)
+        if value is None:
+            self.misses += 1
+            value = search()
+            if value and value != "[]":
+                self.set(key, value)
+        else:
+            self.hits += 1
+
+        if plan is not None:
+            plan[key] = value
+        return value
+
+
+search_cache = SearchCache()
+
+
+@contextmanager
+def plan_scope():
+    """
+    Dedupe searches within one plan - every agent of the plan (including tasks started inside the scope)
+    gets the result of a query that was already issued for this plan
+    """
+    token = current_plan.set({})
+    try:
+        yield
+    finally:
+        current_plan.reset(token)
+
+
+class CachedDuckDuckGoTools(DuckDuckGoTools):
+    """
+    DuckDuckGoTools backed by the shared search cache
+    """
+
+    def _key(self, kind: str, query: str, max_results: int):
+        actual_max_results = self.fixed_max_results or max_results
+        return f"{kind}|{normalize_query(self.modifier or '')}|{normalize_query(query)}|{actual_max_results}"
+
+    def duckduckgo_search(self, query: str, max_results: int = 5) -> str:
+        """Use this function to search DuckDuckGo for a query.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The result from DuckDuckGo.
+        """
+        return search_cache.cached(
+            self._key("search", query, max_results),
+            lambda: super(CachedDuckDuckGoTools, self).duckduckgo_search(query, max_results),
+        )
+
+    def duckduckgo_news(self, query: str, max_results: int = 5) -> str:
+        """Use this function to get the latest news from DuckDuckGo.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The latest news from DuckDuckGo.
+        """
+        return search_cache.cached(
+            self._key("news", query, max_results),
+            lambda: super(CachedDuckDuckGoTools, self).duckduckgo_news(query, max_results),
+        )
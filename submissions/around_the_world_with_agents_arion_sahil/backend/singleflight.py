@@ -0,0 +1,111 @@
+import asyncio
+import functools
+
+from trip_log import get_logger
+
+log = get_logger("singleflight")
+
+
+def normalize(value):
+    """
+    Turn call arguments into a hashable, case / whitespace insensitive key
+    """
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, (list, tuple, set)):
+        return tuple(normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize(v)) for k, v in value.items()))
+    return value
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls - the first caller starts the work,
+    every other caller with the same key awaits the same in-flight task.
+
+    - errors are delivered to every waiter and the key is forgotten, so the next call retries
+    - a cancelled waiter only cancels the shared work if it was the last one waiting for it
+    """
+
+    def __init__(self):
+        self.calls = {}
+
+    def in_flight(self):
+        return len(self.calls)
+
+    async def do(self, key, fn, *args, channels: dict = None, **kwargs):
+        """
+        Run fn(*args, **kwargs) once per key. `channels` are futures used for early (partial) results -
+        the shared call gets its own futures, and every caller's futures are resolved from them.
+        """
+        # tasks are bound to a loop, so calls on different loops are never shared
+        loop = asyncio.get_running_loop()
+        key = (id(loop), key)
+        channels = channels or {}
+
+        entry = self.calls.get(key)
+        if entry is None:
+            shared = {name: loop.create_future() for name in channels}
+            task = asyncio.ensure_future(fn(*args, **kwargs, **shared))
+            entry = self.calls[key] = {"task": task, "waiters": 0, "channels": shared}
+            task.add_done_callback(functools.partial(self._forget, key, entry))
+        else:
+            log.debug(f"Joining in-flight request for {fn.__name__}")
+
+        for name, future in channels.items():
+            entry["channels"][name].add_done_callback(functools.partial(self._relay, future))
+
+        entry["waiters"] += 1
+        try:
+            return await asyncio.shield(entry["task"])
+        except asyncio.CancelledError:
+            if entry["waiters"] == 1 and not entry["task"].done():
+                # forget the key right away, a new identical call must not join a task that is being cancelled
+                if self.calls.get(key) is entry:
+                    del self.calls[key]
+                entry["task"].cancel()
+            raise
+        finally:
+            entry["waiters"] -= 1
+
+    def _forget(self, key, entry, task):
+        if self.calls.get(key) is entry:
+            del self.calls[key]
+        # never leave an early-result channel hanging once the work is over
+        for future in entry["channels"].values():
+            if future.done():
+                continue
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(None)
+
+    @staticmethod
+    def _relay(target, source):
+        if target.done():
+            return
+        if source.cancelled():
+            target.cancel()
+        elif source.exception() is not None:
+            target.set_exception(source.exception())
+        else:
+            target.set_result(source.result())
+
+
+agent_flights = SingleFlight()
+
+
+def coalesce(fn):
+    """
+    Decorator - identical concurrent calls of an agent share one in-flight request
+    """
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        channels = {name: value for name, value in kwargs.items() if isinstance(value, asyncio.Future)}
+        plain = {name: value for name, value in kwargs.items() if name not in channels}
+        key = (fn.__name__, normalize(args), normalize(plain), tuple(sorted(channels)))
+        return await agent_flights.do(key, fn, *args, channels=channels, **plain)
+    return wrapper
@@ -0,0 +1,91 @@
+import time
+import asyncio
+
+from router import model_router, model_key, charge
+from ledger import ledger
+from cassette import cassette
+
+
+def resolve(future, result=None, exception=None):
+    """
+    Resolve a future unless somebody already did (or cancelled it)
+    """
+    if future is None or future.done():
+        return
+    if isinstance(exception, asyncio.CancelledError):
+        future.cancel()
+    elif exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+
+
+class FirstLineParser:
+    """
+    Resolves a future with the first non-empty line of the output as soon as that line is complete
+    """
+
+    def __init__(self, future):
+        self.future = future
+
+    @staticmethod
+    def clean(line: str):
+        return line.strip().strip('*#`').strip()
+
+    def feed(self, text: str):
+        if self.future.done():
+            return
+        for line in text.lstrip().split('\n')[:-1]:
+            if self.clean(line):
+                resolve(self.future, self.clean(line))
+                return
+
+    def close(self, text: str):
+        for line in (text or "").split('\n'):
+            if self.clean(line):
+                resolve(self.future, self.clean(line))
+                return
+        resolve(self.future, None)
+
+
+async def stream_agent(agent, message, parsers=()):
+    """
+    Run an agent in streaming mode, feeding the accumulated text to every parser as it arrives.
+    Returns the final run response (same shape as agent.arun(message, stream=False)).
+    Latency and errors are reported to the model router and the run is charged to the current trip.
+    On error the parsers are left unresolved, so a fallback agent can still resolve them.
+    """
+    async def run():
+        provider, model_id = model_key(agent.model)
+        started = time.perf_counter()
+        text = ""
+        try:
+            async for chunk in await agent.arun(message, stream=True):
+                delta = getattr(chunk, 'content', None)
+                if getattr(chunk, 'event', 'RunResponse') != 'RunResponse' or not isinstance(delta, str):
+                    continue
+                text += delta
+                for parser in parsers:
+                    parser.feed(text)
+        except asyncio.CancelledError:
+            # cancelled by us (prefetch branch dropped, last single-flight waiter gone), not a model failure
+            raise
+        except Exception:
+            model_router.record(provider, model_id, time.perf_counter() - started, ok=False)
+            raise
+        model_router.record(provider, model_id, time.perf_counter() - started, ok=True)
+
+        response = getattr(agent, 'run_response', None)
+        if response is None:
+            return text
+        if not getattr(response, 'content', None):
+            response.content = text
+        return response
+
+    ledger.check()
+    response = await cassette.agent_run(agent, message, run)
+    charge(agent, response)
+    text = getattr(response, 'content', response)
+    for parser in parsers:
+        parser.close(text if isinstance(text, str) else "")
+    return response
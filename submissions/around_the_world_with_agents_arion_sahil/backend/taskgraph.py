@@ -0,0 +1,105 @@
+import time
+import asyncio
+
+from trip_log import get_logger
+
+log = get_logger("taskgraph")
+
+
+class TaskGraph:
+    """
+    Minimal async task-graph executor.
+    Every node is an async function taking the results dict of the graph; a node starts as soon as
+    all of its dependencies are done, so independent nodes run concurrently and the total latency
+    is the critical path of the graph instead of the sum of all calls.
+    Nodes may add more nodes while the graph is running (dynamic fan-out).
+    If a node fails, the nodes depending on it are skipped and the error is kept in `errors`,
+    unless they were added with allow_failed=True (e.g. a final merge step).
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.results = {}
+        self.errors = {}
+        self.timings = {}
+
+    def add(self, name: str, fn, deps: tuple = (), allow_failed: bool = False):
+        if name in self.nodes:
+            raise ValueError(f"Node {name} already exists")
+        self.nodes[name] = (fn, tuple(deps), allow_failed)
+
+    def add_deps(self, name: str, deps: tuple):
+        """
+        Add dependencies to a node that has not started yet (e.g. a merge step waiting for a dynamic fan-out)
+        """
+        fn, current, allow_failed = self.nodes[name]
+        self.nodes[name] = (fn, current + tuple(dep for dep in deps if dep not in current), allow_failed)
+
+    async def _run_node(self, name: str, fn):
+        started = time.perf_counter()
+        try:
+            return await fn(self.results)
+        finally:
+            self.timings[name] = (started, time.perf_counter())
+
+    async def run(self):
+        """
+        Run the graph to completion, returns the results dict
+        """
+        running = {}
+        finished = set()
+
+        while True:
+            # keep scanning while skipping a node can unblock (or skip) others
+            changed = True
+            while changed:
+                changed = False
+                for name, (fn, deps, allow_failed) in list(self.nodes.items()):
+                    if name in finished or name in running.values():
+                        continue
+                    unknown = [dep for dep in deps if dep not in self.nodes]
+                    if unknown:
+                        raise ValueError(f"Node {name} depends on unknown node(s) {unknown}")
+                    failed = [dep for dep in deps if dep in self.errors]
+                    if failed and not allow_failed:
+                        self.errors[name] = RuntimeError(f"skipped, dependency {failed[0]} failed")
+                        finished.add(name)
+                        changed = True
+                        continue
+                    if all(dep in self.results or dep in self.errors for dep in deps):
+                        running[asyncio.create_task(self._run_node(name, fn), name=f"node:{name}")] = name
+
+            if not running:
+                # anything left can never run (cyclic dependencies)
+                stuck = [name for name in self.nodes if name not in finished]
+                if stuck:
+                    raise ValueError(f"Task graph has unresolvable dependencies: {stuck}")
+                return self.results
+
+            try:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            except asyncio.CancelledError:
+                for task in running:
+                    task.cancel()
+                raise
+
+            for task in done:
+                name = running.pop(task)
+                finished.add(name)
+                if task.exception() is not None:
+                    log.warning(f"Node {name} failed: {task.exception()}")
+                    self.errors[name] = task.exception()
+                else:
+                    self.results[name] = task.result()
+
+    def critical_path(self):
+        """
+        Wall-clock time of the run vs the sum of all node durations
+        """
+        if not self.timings:
+            return {"wall_clock": 0.0, "sum_of_nodes": 0.0}
+        starts, ends = zip(*self.timings.values())
+        return {
+            "wall_clock": round(max(ends) - min(starts), 2),
+            "sum_of_nodes": round(sum(end - start for start, end in self.timings.values()), 2),
+        }
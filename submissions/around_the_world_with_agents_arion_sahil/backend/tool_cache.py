@@ -0,0 +1,116 @@
+import asyncio
+import functools
+import threading
+from collections import OrderedDict
+
+from config import CONFIG
+from ledger import current_trip
+from singleflight import normalize
+from trip_log import get_logger
+
+log = get_logger("tool_cache")
+
+# agno passes these to tool entrypoints that ask for them, they are not part of the request
+CONTEXT_ARGS = ("agent", "team")
+
+
+def tool_key(name: str, kwargs: dict):
+    """
+    Cache key of a tool call - case / whitespace insensitive, coordinates rounded to ~10m, empty arguments dropped
+    """
+    def clean(value):
+        if isinstance(value, float):
+            return round(value, 4)
+        if isinstance(value, dict):
+            return {k: clean(v) for k, v in value.items() if v not in (None, "", [], {})}
+        if isinstance(value, (list, tuple)):
+            return [clean(v) for v in value]
+        return value
+    return (name, normalize(clean({k: v for k, v in kwargs.items() if k not in CONTEXT_ARGS})))
+
+
+class ToolCache:
+    """
+    Results of MCP tool calls (Google Maps place search, geocoding, directions, ...), shared by every agent of a trip.
+
+    Identical calls made while the first one is still running wait for it instead of calling the tool again.
+    Only the last TOOL_CACHE_TRIPS trips are kept, failed calls are never cached.
+    """
+
+    def __init__(self, max_trips: int = None):
+        self.max_trips = CONFIG["TOOL_CACHE_TRIPS"] if max_trips is None else max_trips
+        self.lock = threading.Lock()
+        self.trips = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _store(self, trip: str):
+        with self.lock:
+            if trip not in self.trips:
+                self.trips[trip] = {}
+                while len(self.trips) > self.max_trips:
+                    self.trips.popitem(last=False)
+            self.trips.move_to_end(trip)
+            return self.trips[trip]
+
+    async def call(self, key, fn):
+        store = self._store(current_trip.get())
+        entry = store.get(key)
+        if entry is not None:
+            self.hits += 1
+            return await asyncio.shield(entry)
+
+        self.misses += 1
+        entry = store[key] = asyncio.ensure_future(fn())
+        try:
+            result = await asyncio.shield(entry)
+        except BaseException:
+            if store.get(key) is entry:
+                del store[key]
+            raise
+        if isinstance(result, str) and result.lower().startswith("error"):
+            store.pop(key, None)
+        return result
+
+    def clear(self, trip: str = None):
+        with self.lock:
+            if trip is None:
+                self.trips.clear()
+            else:
+                self.trips.pop(trip, None)
+
+
+tool_cache = ToolCache()
+
+
+def guard_toolkit(toolkit, budget: int = None):
+    """
+    Serve the toolkit's calls from the trip's tool cache and cap the number of tool calls of the agent run
+    using it (call after the MCP session has been entered, every MCP agent run gets its own toolkit).
+
+    Once the budget is spent the tools stop running and tell the model to answer with what it has,
+    so a looping agent still returns its best answer so far.
+    """
+    budget = CONFIG["TOOL_CALL_BUDGET"] if budget is None else budget
+    calls = {"count": 0}
+
+    def guard(name: str, entrypoint):
+        @functools.wraps(entrypoint)
+        async def wrapper(*args, **kwargs):
+            calls["count"] += 1
+            if budget and calls["count"] > budget:
+                if calls["count"] == budget + 1:
+                    log.info(f"Tool call budget of {budget} spent, cutting off {name}")
+                return f"Tool call budget exhausted ({budget} calls). Do not call any more tools, answer now with the information you already have."
+
+            async def run():
+                result = entrypoint(*args, **kwargs)
+                if asyncio.iscoroutine(result):
+                    result = await result
+                return result
+            return await tool_cache.call(tool_key(name, kwargs), run)
+        return wrapper
+
+    for name, function in getattr(toolkit, "functions", {}).items():
+        function.entrypoint = guard(name, function.entrypoint)
+    return toolkit
@@ -0,0 +1,67 @@
+import sys
+import queue
+import atexit
+import logging
+import logging.handlers
+
+from config import CONFIG
+from ledger import current_trip
+
+FORMAT = "%(asctime)s %(levelname)-7s [trip %(trip)s] %(name)s: %(message)s"
+
+
+class TripFilter(logging.Filter):
+    """
+    Tags every record with the trip it was logged from (the correlation id set by trip_scope)
+    """
+
+    def filter(self, record):
+        # records logged on behalf of another trip (e.g. from a watchdog thread) pass it in `extra`
+        if not hasattr(record, "trip"):
+            record.trip = current_trip.get()
+        return True
+
+
+_listener = None
+
+
+def setup_logging(level: str = None, stream=None):
+    """
+    Route the app's diagnostics through a queue so logging never blocks the event loop.
+
+    Records are tagged with their trip on the calling side (the contextvar is only visible there)
+    and formatted / written by a listener thread.
+    """
+    global _listener
+    root = logging.getLogger("trip")
+    root.setLevel(level or CONFIG["LOG_LEVEL"])
+    if _listener is not None:
+        return root
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter(FORMAT))
+    records = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.addFilter(TripFilter())
+    root.addHandler(queue_handler)
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return root
+
+
+def get_logger(name: str):
+    setup_logging()
+    return logging.getLogger(f"trip.{name}")
+
+
+async def show_response(response):
+    """
+    Pretty-print an agent response to the console, skipped in quiet (production) mode
+    """
+    if CONFIG["QUIET"]:
+        return
+    from agno.utils.pprint import apprint_run_response
+    await apprint_run_response(response, markdown=True)